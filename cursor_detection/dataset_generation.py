@@ -5,18 +5,26 @@ import os
 import random
 import shutil
 import glob
-import pyautogui
 import cv2
 
 def generate_data(data_path:str, img_folder:str, cursor_folder:str, 
                   save_with_category = True,
-                  img_w_h = (1920, 1080), cursor_h_range = (25, 38)):
+                  img_w_h = (1920, 1080), cursor_h_range = (25, 38),
+                  workers = 1, seed = None):
     '''
     Takes in path to data folder, background images and cursor images to overlap;
           specify background image width and height to resize into, specify a range of cursor heights to resize
     
     For each image in img_folder, overlays a random cursor and saves new image with model results it into data_path/generated/img_folder
+
+    workers: number of processes overlaying slides in parallel (None: one per CPU)
+    seed: seed for the choice, size and position of cursors. Each slide draws from its own generator seeded with 
+          (seed, index of the slide), so the same seed gives the same data whatever the number of workers
+          (default: drawn from np.random)
     '''
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
     # Open slide image
     slide_names = os.listdir(os.path.join(data_path, "images_raw", img_folder))
     cursor_names = os.listdir(os.path.join(data_path, cursor_folder))
@@ -24,61 +32,85 @@ def generate_data(data_path:str, img_folder:str, cursor_folder:str,
     num_cursors = len(cursor_names)-1
     print(f"Number of cursor images: {num_cursors} from path {os.path.join(data_path, cursor_folder)}")
 
-    for slide_name in slide_names:
+    # Create output folders once: one pointer category (_nc1), and one per cursor type (_nc3)
+    output_folders = [os.path.join(data_path, "generated", img_folder + "_nc1", "all")]
+    if save_with_category:
+        output_folders.append(os.path.join(data_path, "generated", img_folder + "_nc3", "all"))
+    for folder in output_folders:
+        os.makedirs(folder, exist_ok=True)
 
-        # Open and Rezie slide image
-        slide = Image.open(os.path.join(data_path, "images_raw", img_folder, slide_name))
-        slide = slide.resize(size=img_w_h)
-    
-        # Open one cursor image randomly
-        rand_index = np.random.randint(0, num_cursors)
-        cursor_name = cursor_names[rand_index]
-        if "pointer" in cursor_name:
-            category = 0
-        elif "hand" in cursor_name:
-            category = 1 
-        elif "text" in cursor_name:
-            category = 2
-        else:
-            raise ValueError(f"Uncategorised cursor image: {cursor_name}")
-        
-        cursor = Image.open(os.path.join(data_path, cursor_folder, cursor_name))
+    if seed is None:
+        seed = np.random.randint(0, 2**31)
+    overlay = partial(overlay_cursor, data_path=data_path, img_folder=img_folder, cursor_folder=cursor_folder,
+                      cursor_names=cursor_names[:num_cursors], output_folders=output_folders,
+                      img_w_h=img_w_h, cursor_h_range=cursor_h_range, seed=seed)
+    if workers == 1:
+        for index, slide_name in enumerate(slide_names):
+            overlay(index, slide_name)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(overlay, range(len(slide_names)), slide_names, chunksize=16))
+    print(f"{len(slide_names)} slides saved to {', '.join(output_folders)}")
 
-        # Resize cursor image
-        cursor_w, cursor_h = cursor.size  
-        slide_w, slide_h = img_w_h # equivalent to slide.size
-        desired_height = np.random.randint(cursor_h_range[0], cursor_h_range[1])
-        scaling_f = (desired_height / cursor_h)
-        resize_w, resize_h = int(scaling_f * cursor_w), int(scaling_f * cursor_h)
-        cursor = cursor.resize(size=(resize_w, resize_h))
-        
-        # Overlay cursor image on slide
-        x, y = np.random.randint(0, slide_w-resize_w), np.random.randint(0, slide_h-resize_h)
-        slide.paste(cursor, (x, y), mask=cursor)
-
-        # Save Result for One pointer category i.e. num_category = 1
-        generated_raw_path = os.path.join(data_path, "generated", img_folder + "_nc1")
-        if not os.path.exists(generated_raw_path):
-            os.mkdir(generated_raw_path)
-        if not os.path.exists(generated_raw_path+"/all"):
-            os.mkdir(generated_raw_path+"/all")
-        slide.save(os.path.join(generated_raw_path, "all", slide_name))
+# cursor images of each process, loaded once, and resized once per height: {(cursor_path, height): image}
+_cursors = {}
+
+def get_cursor(cursor_path:str, height:int):
+    ''' returns the cursor image at cursor_path resized to height, keeping its aspect ratio '''
+    if (cursor_path, height) not in _cursors:
+        if (cursor_path, None) not in _cursors:
+            _cursors[(cursor_path, None)] = Image.open(cursor_path)
+            _cursors[(cursor_path, None)].load()
+        cursor = _cursors[(cursor_path, None)]
+        cursor_w, cursor_h = cursor.size
+        scaling_f = (height / cursor_h)
+        _cursors[(cursor_path, height)] = cursor.resize(size=(int(scaling_f * cursor_w), int(scaling_f * cursor_h)))
+    return _cursors[(cursor_path, height)]
+
+def overlay_cursor(index:int, slide_name:str, data_path:str, img_folder:str, cursor_folder:str, cursor_names, 
+                   output_folders, img_w_h, cursor_h_range, seed:int):
+    '''
+    Overlays a random cursor from cursor_names on slide slide_name, as described in generate_data, 
+    and saves the slide with its annotation into each of output_folders (_nc1 then _nc3).
+    The slide is encoded once, and the same bytes are written to every folder
+    '''
+    import io
+    rng = np.random.default_rng([seed, index])
+
+    # Open and Rezie slide image
+    slide = Image.open(os.path.join(data_path, "images_raw", img_folder, slide_name))
+    slide = slide.resize(size=img_w_h)
+
+    # Open one cursor image randomly
+    cursor_name = cursor_names[rng.integers(0, len(cursor_names))]
+    if "pointer" in cursor_name:
+        category = 0
+    elif "hand" in cursor_name:
+        category = 1 
+    elif "text" in cursor_name:
+        category = 2
+    else:
+        raise ValueError(f"Uncategorised cursor image: {cursor_name}")
+
+    # Resize cursor image
+    cursor = get_cursor(os.path.join(data_path, cursor_folder, cursor_name), int(rng.integers(cursor_h_range[0], cursor_h_range[1])))
+    resize_w, resize_h = cursor.size
+    slide_w, slide_h = img_w_h # equivalent to slide.size
+
+    # Overlay cursor image on slide
+    x, y = int(rng.integers(0, slide_w-resize_w)), int(rng.integers(0, slide_h-resize_h))
+    slide.paste(cursor, (x, y), mask=cursor)
+
+    # Encode once, in the format given by the extension of slide_name
+    encoded = io.BytesIO()
+    slide.save(encoded, format=Image.registered_extensions()[os.path.splitext(slide_name)[1].lower()])
+    box = f"{(x+(0.5*resize_w))/slide_w} {(y+(0.5*resize_h))/slide_h} {resize_w/slide_w} {resize_h/slide_h}"
+    for folder, class_id in zip(output_folders, (0, category)):
+        with open(os.path.join(folder, slide_name), "wb") as f:
+            f.write(encoded.getbuffer())
         # Create annotation file
-        f = open(os.path.join(generated_raw_path, "all", slide_name.split('.')[0] + ".txt"), "w")
-        f.write(f"0 {(x+(0.5*resize_w))/slide_w} {(y+(0.5*resize_h))/slide_h} {resize_w/slide_w} {resize_h/slide_h}")
-        f.close()  
-        
-        if save_with_category:
-            generated_raw_path = os.path.join(data_path, "generated", img_folder + "_nc3")
-            if not os.path.exists(generated_raw_path):
-                os.mkdir(generated_raw_path)
-            if not os.path.exists(generated_raw_path+"/all"):
-                os.mkdir(generated_raw_path+"/all")
-            slide.save(os.path.join(generated_raw_path, "all", slide_name))
-            # Create annotation file
-            f = open(os.path.join(generated_raw_path, "all", slide_name.split('.')[0] + ".txt"), "w")
-            f.write(f"{category} {(x+(0.5*resize_w))/slide_w} {(y+(0.5*resize_h))/slide_h} {resize_w/slide_w} {resize_h/slide_h}")
-            f.close()  
+        with open(os.path.join(folder, slide_name.split('.')[0] + ".txt"), "w") as f:
+            f.write(f"{class_id} {box}")
 
 def train_test_val_split(data_path:str, img_folder:str, train, validation, test):
     generated_img_folder = os.path.join(data_path, "generated", img_folder)
@@ -117,6 +149,86 @@ def train_test_val_split(data_path:str, img_folder:str, train, validation, test)
         shutil.copy(glob.glob(generated_img_folder+'/all/'+raw_name+'*.jpg')[0], os.path.join(generated_img_folder, dest_folder, file_name.split('.')[0]+".png"))
         shutil.copy(glob.glob(generated_img_folder+'/all/'+raw_name+'*.txt')[0], os.path.join(generated_img_folder, dest_folder, file_name.split('.')[0]+".txt"))
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def split_of(name:str, train, validation, seed=42):
+    '''
+    returns 'train', 'val' or 'test' for the image named name, from a hash of seed and name:
+    the same image always lands in the same split, and changing the ratios only moves images across the changed boundary
+    '''
+    import hashlib
+    position = int(hashlib.sha1(f"{seed}:{name}".encode()).hexdigest()[:15], 16) / 16**15 # uniform in [0, 1)
+    if position < train:
+        return 'train'
+    if position < train + validation:
+        return 'val'
+    return 'test'
+
+def split_dataset(data_path:str, img_folder:str, train, validation, test, mode='manifest', seed=42):
+    '''
+    Splits data_path/generated/img_folder/all into train, val and test without copying, for large datasets
+    The all folder is listed once. Each image is assigned with split_of, so running it again after new images
+    are added to all only assigns the new images, and every other image stays in its split.
+    Images in the test split are those not in train or validation; test is only checked to not exceed the rest.
+
+    mode = 'manifest': writes train.txt, val.txt and test.txt next to all, listing the absolute image paths 
+                       (labels are found next to the images); set train: train.txt etc. in the dataset yaml
+    mode = 'hardlink': hard links each image and its label into the train, val and test folders (as 
+                       train_test_val_split lays them out, keeping file names), replacing links to regenerated files
+                       and removing any other file in those folders. Falls back to copying where hard links are not supported
+
+    Returns: dictionary of split name to the list of image file names in it
+    '''
+    assert train + validation + test <= 1 + 1e-9, "train, validation and test must add up to at most 1"
+    generated_img_folder = os.path.join(data_path, "generated", img_folder)
+    all_folder = os.path.join(generated_img_folder, 'all')
+
+    # list all once, pairing images with their label files
+    images, labels = [], set()
+    for entry in os.scandir(all_folder):
+        stem, extension = os.path.splitext(entry.name)
+        if extension.lower() in IMAGE_EXTENSIONS:
+            images.append(entry.name)
+        elif extension == '.txt':
+            labels.add(stem)
+    images.sort()
+
+    splits = {'train': [], 'val': [], 'test': []}
+    for image in images:
+        splits[split_of(image, train, validation, seed)].append(image)
+
+    for split, split_images in splits.items():
+        if mode == 'manifest':
+            manifest_path = os.path.join(generated_img_folder, split + '.txt')
+            with open(manifest_path + '.tmp', 'w') as f:
+                f.writelines(os.path.abspath(os.path.join(all_folder, image)) + '\n' for image in split_images)
+            os.replace(manifest_path + '.tmp', manifest_path)
+        elif mode == 'hardlink':
+            split_folder = os.path.join(generated_img_folder, split)
+            os.makedirs(split_folder, exist_ok=True)
+            wanted = set(split_images)
+            wanted.update(os.path.splitext(image)[0] + '.txt' for image in split_images 
+                          if os.path.splitext(image)[0] in labels)
+            kept = set()
+            for name in os.listdir(split_folder):
+                # drop files that left this split, and links to files regenerated in all since
+                if name in wanted and os.path.samefile(os.path.join(all_folder, name), os.path.join(split_folder, name)):
+                    kept.add(name)
+                else:
+                    os.remove(os.path.join(split_folder, name))
+            for name in wanted - kept:
+                try:
+                    os.link(os.path.join(all_folder, name), os.path.join(split_folder, name))
+                except OSError:
+                    shutil.copy2(os.path.join(all_folder, name), os.path.join(split_folder, name))
+        else:
+            raise ValueError(f"Unknown split mode: {mode}")
+
+    missing = sum(os.path.splitext(image)[0] not in labels for image in images)
+    print(f"{len(images)} images split into train {len(splits['train'])}, val {len(splits['val'])}, test {len(splits['test'])}"
+          + (f" ({missing} without labels)" if missing else ""))
+    return splits
+
 def generate_cursor_video(output_vid_name, desired_width = 1920, desired_height = 1280, fps=10, duration_sec = 5, cursor_file_name = 'pointer8.png'):
     '''
     Screen records the cursor movement for input duration
@@ -125,7 +237,9 @@ def generate_cursor_video(output_vid_name, desired_width = 1920, desired_height
 
     Transparency overlay code referecned from: https://gist.github.com/clungzta/b57163b165d3247af2ebfe2868f7dccf
     LIMITTAION: please do not hover cursor too near the right and bottom edges of the screen as cursor will be out of bounds
+    Needs a display; use generate_synthetic_video on a headless machine
     '''
+    import pyautogui # imported here, as it needs a display, so the rest of the module works without one
 
     video_path = os.path.join('data', 'videos', output_vid_name + '.mp4')
     log_path = os.path.join('data', 'videos', output_vid_name + '.txt')
@@ -188,6 +302,151 @@ def generate_cursor_video(output_vid_name, desired_width = 1920, desired_height
     print(f"Video saved to {video_path}")
     print(f"Cursor positions saved to {log_path}")
 
+def load_cursor_sprite(cursor_path:str, height=25):
+    '''
+    loads the cursor image at cursor_path resized to height, as generate_cursor_video pastes it
+    Returns: (sprite, mask), the BGR pixels of shape (h, w, 3) and a boolean mask of shape (h, w, 1) of the pixels
+             to paste, from the median-blurred alpha channel
+    '''
+    cursor = Image.open(cursor_path).convert('RGBA')
+    cursor_w, cursor_h = cursor.size
+    scaling_f = (height / cursor_h)
+    cursor = np.array(cursor.resize(size=(int(scaling_f * cursor_w), int(scaling_f * cursor_h))))
+    sprite = cv2.cvtColor(cursor[:, :, :3], cv2.COLOR_RGB2BGR)
+    mask = cv2.medianBlur(np.ascontiguousarray(cursor[:, :, 3]), 5) > 0
+    return sprite, mask[:, :, None]
+
+def make_arrow_sprite(height=25):
+    '''
+    draws a white arrow cursor with a black outline, of height pixels, for when no cursor image is at hand
+    Returns: (sprite, mask) as load_cursor_sprite
+    '''
+    arrow = np.array([[0, 0], [0, 25], [6, 19], [11, 28], [14, 27], [10, 18], [18, 18]], dtype=np.float64)
+    arrow = np.round(arrow * (height - 1) / 28).astype(np.int32)
+    h, w = height, int(arrow[:, 0].max()) + 1
+    sprite = np.zeros((h, w, 3), dtype=np.uint8)
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.fillPoly(sprite, [arrow], (255, 255, 255))
+    cv2.polylines(sprite, [arrow], True, (0, 0, 0), 1)
+    cv2.fillPoly(mask, [arrow], 1)
+    cv2.polylines(mask, [arrow], True, 1, 1)
+    return sprite, mask.astype(bool)[:, :, None]
+
+def synthetic_cursor_path(n_frames:int, fps, max_x, max_y, rng):
+    '''
+    generates n_frames cursor positions (top left corner, within [0, max_x] x [0, max_y]) made of
+    loops (1-3s circles), underlines (2-4s horizontal strokes), stationary dwells (3-6s) and random walks (1-5s)
+
+    Returns: (positions, events), positions an int array of shape (n_frames, 2), 
+             events a list of [start_time, end_time, type] of the loops, underlines and stationary dwells in ms
+    '''
+    increment = 1000/fps
+    bounds = np.array([max_x, max_y], dtype=np.float64)
+    positions = np.empty((n_frames, 2))
+    events = []
+    position = rng.uniform((0, 0), bounds)
+    i = 0
+    while i < n_frames:
+        kind = rng.choice(['loop', 'underline', 'stationary', 'walk'])
+        if kind == 'loop':
+            n = int(rng.integers(fps, 3*fps))
+            radius = rng.uniform(30, 120)
+            # circle through the current position, centred towards the middle of the screen
+            towards = bounds/2 - position
+            start_angle = np.arctan2(-towards[1], -towards[0])
+            angles = start_angle + rng.choice([-1, 1]) * np.linspace(0, 2*np.pi, n)
+            centre = position - radius * np.array([np.cos(start_angle), np.sin(start_angle)])
+            segment = centre + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        elif kind == 'underline':
+            n = int(rng.integers(2*fps, 4*fps))
+            length = rng.uniform(200, 600) * (1 if position[0] < bounds[0]/2 else -1)
+            segment = position + np.stack([np.linspace(0, length, n), np.zeros(n)], axis=1)
+        elif kind == 'stationary':
+            n = int(rng.integers(3*fps, 6*fps))
+            segment = np.repeat(position[None], n, axis=0)
+        else:
+            n = int(rng.integers(fps, 5*fps))
+            segment = position + np.cumsum(rng.normal(0, 20, (n, 2)), axis=0)
+        segment = np.clip(segment, 0, bounds)[:n_frames - i]
+        positions[i:i + len(segment)] = segment
+        if kind != 'walk':
+            events.append([round(i*increment), round((i + len(segment) - 1)*increment), str(kind)])
+        position = segment[-1]
+        i += len(segment)
+    return positions.round().astype(int), events
+
+def make_plain_slide(width:int, height:int, rng):
+    ''' returns a light BGR slide with a title bar and random lines of "text", for when no slide images are given '''
+    slide = np.full((height, width, 3), 245, dtype=np.uint8)
+    slide[:height//8] = rng.integers(60, 200, 3)
+    line_height = height // 20
+    for top in range(height // 5, height - line_height, line_height):
+        if rng.random() < 0.7:
+            slide[top:top + line_height//3, width//10:width//10 + int(rng.integers(width//5, width - width//5))] = 90
+    return slide
+
+def generate_synthetic_video(output_vid_name, slide_folder=None, desired_width = 1920, desired_height = 1280, fps=10, 
+                             duration_sec = 60, cursor_file_name = 'pointer8.png', cursor_height = 25, slide_sec = 30, seed = 0,
+                             output_dir = os.path.join('data', 'videos')):
+    '''
+    Renders a cursor video without a display, as a reproducible replacement for generate_cursor_video
+    Pastes the cursor of height cursor_height along synthetic_cursor_path over slides, changing slide every slide_sec
+    Slides are the images of data/images_raw/slide_folder in order, or plain generated slides if slide_folder is None
+    The cursor is data/cursors/cursor_file_name, or a drawn arrow (make_arrow_sprite) if cursor_file_name is None
+
+    Outputs, in output_dir (default data/videos):
+    - output_vid_name.mp4
+    - output_vid_name.txt, the cursor position (top left corner) of each frame as time,x,y lines, as generate_cursor_video
+    - output_vid_name_events.json, the [start_time, end_time, type] of the loops, underlines and stationary dwells drawn
+    The same arguments always produce the same files
+    Returns: (video_path, log_path)
+    '''
+    import json
+    rng = np.random.default_rng(seed)
+    video_path = os.path.join(output_dir, output_vid_name + '.mp4')
+    log_path = os.path.join(output_dir, output_vid_name + '.txt')
+    events_path = os.path.join(output_dir, output_vid_name + '_events.json')
+
+    if cursor_file_name is None:
+        sprite, mask = make_arrow_sprite(cursor_height)
+    else:
+        sprite, mask = load_cursor_sprite(os.path.join('data', 'cursors', cursor_file_name), cursor_height)
+    h, w, _ = sprite.shape
+    n_frames = int(duration_sec * fps)
+    positions, events = synthetic_cursor_path(n_frames, fps, desired_width - w, desired_height - h, rng)
+
+    if slide_folder is not None:
+        slide_names = sorted(os.listdir(os.path.join('data', 'images_raw', slide_folder)))
+    increment = 1000/fps
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(video_path, fourcc, fps, (desired_width, desired_height))
+    slide = None
+    with open(log_path, "w") as log_file:
+        for count, (x, y) in enumerate(positions.tolist()):
+            if count % int(slide_sec * fps) == 0:
+                if slide_folder is None:
+                    slide = make_plain_slide(desired_width, desired_height, rng)
+                else:
+                    slide_name = slide_names[count // int(slide_sec * fps) % len(slide_names)]
+                    slide = cv2.resize(cv2.imread(os.path.join('data', 'images_raw', slide_folder, slide_name)), 
+                                       (desired_width, desired_height))
+                frame = slide.copy()
+            else:
+                # only the area under the previous cursor changes back to the slide
+                frame[previous_y:previous_y+h, previous_x:previous_x+w] = slide[previous_y:previous_y+h, previous_x:previous_x+w]
+
+            np.copyto(frame[y:y+h, x:x+w], sprite, where=mask)
+            out.write(frame)
+            log_file.write(f"{round(count*increment)},{x},{y}\n")
+            previous_x, previous_y = x, y
+    out.release()
+    with open(events_path, "w") as f:
+        json.dump(events, f)
+
+    print(f"Video saved to {video_path}")
+    print(f"Cursor positions saved to {log_path}")
+    return video_path, log_path
+
 if __name__ == '__main__':
     # Run file from root of repository
     print("--- begin overlaying cursor images --- ")
@@ -0,0 +1,156 @@
+# Functions to run generate_results over many recordings in parallel
+
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+# YOLO model of the current worker process, loaded once by _init_worker
+_model = None
+
+def list_videos(source:str):
+    '''
+    takes in a directory of recordings, or a manifest file listing one video path per line
+    (blank lines and lines starting with # are ignored; relative paths are relative to the manifest)
+    returns the list of video paths
+    '''
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if name.lower().endswith(VIDEO_EXTENSIONS))
+
+    manifest_dir = os.path.dirname(source)
+    with open(source, 'r') as f:
+        lines = [line.strip() for line in f]
+    return [line if os.path.isabs(line) else os.path.join(manifest_dir, line)
+            for line in lines if line and not line.startswith('#')]
+
+def video_output_dirs(video_paths, output_dir='results'):
+    '''
+    returns a dictionary of video_path: directory for its generate_results outputs, mirroring the folders of
+    video_paths below their common folder inside output_dir, so videos of the same name in different folders
+    (e.g. course1/lecture01.mp4 and course2/lecture01.mp4) do not write to the same files
+    raises ValueError if two videos would still share outputs, e.g. lecture01.mp4 and lecture01.mov in one folder
+    '''
+    if not video_paths:
+        return {}
+    folders = [os.path.dirname(os.path.abspath(video_path)) for video_path in video_paths]
+    common = os.path.commonpath(folders)
+    output_dirs = {video_path: os.path.normpath(os.path.join(output_dir, os.path.relpath(folder, common)))
+                   for video_path, folder in zip(video_paths, folders)}
+
+    # generate_results names its outputs from the video's name up to the first dot
+    outputs = {}
+    for video_path in video_paths:
+        name = (output_dirs[video_path], os.path.basename(video_path).split('.')[0])
+        outputs.setdefault(name, []).append(video_path)
+    clashes = [paths for paths in outputs.values() if len(paths) > 1]
+    if clashes:
+        raise ValueError("Videos would overwrite each other's results: " +
+                         "; ".join(", ".join(paths) for paths in clashes))
+    return output_dirs
+
+def _init_worker(weights_path:str, threads_per_worker):
+    ''' loads the YOLO weights once for every video handled by this worker process '''
+    global _model
+    if threads_per_worker:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    from ultralytics import YOLO
+    _model = YOLO(weights_path)
+
+def _process_video(video_path:str, output_dir:str, kwargs:dict):
+    ''' runs generate_results on one video with the worker's model, and never raises '''
+    import cv2
+    from cursor_tracker.run import generate_results
+
+    summary = {'video_path': video_path, 'frames': 0}
+    start = time.perf_counter()
+    try:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video {video_path}")
+        summary['frames'] = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+        cap.release()
+
+        detections = generate_results(_model, video_path, output_dir=output_dir, **kwargs)
+        summary['detections'] = sum(1 for _ in detections)
+        summary['status'] = 'ok'
+    except Exception:
+        summary['status'] = 'failed'
+        summary['error'] = traceback.format_exc()
+    summary['elapsed_s'] = round(time.perf_counter() - start, 2)
+    summary['frames_per_s'] = round(summary['frames'] / summary['elapsed_s'], 2) if summary['elapsed_s'] else None
+    return summary
+
+def run_batch(weights_path:str, source:str, workers=None, threads_per_worker=None, output_dir='results', **kwargs):
+    '''
+    Runs generate_results on every video in source (see list_videos) across a pool of worker processes.
+    Each worker loads the YOLO weights at weights_path once and reuses them for all of its videos.
+
+    workers: number of worker processes (default: number of CPUs)
+    threads_per_worker: if set, limits the torch threads of each worker, to avoid oversubscribing CPU-only machines
+    output_dir: where results are saved, in the same folders relative to output_dir as the videos are to each other
+                (see video_output_dirs). Videos that would share results are rejected before any is processed
+    kwargs: passed on to generate_results, e.g. sample_fps=10, render=False, output_format='jsonl'
+
+    A failure in one video does not stop the others.
+    Prints progress as each video finishes, and a summary at the end
+    Returns a list with one summary dictionary per video, in the order of source
+    '''
+    video_paths = list_videos(source)
+    output_dirs = video_output_dirs(video_paths, output_dir)
+    for directory in set(output_dirs.values()):
+        os.makedirs(directory, exist_ok=True)
+    print(f"Processing {len(video_paths)} videos from {source}")
+
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(weights_path, threads_per_worker)) as pool:
+        futures = {pool.submit(_process_video, video_path, output_dirs[video_path], kwargs): video_path for video_path in video_paths}
+        for count, future in enumerate(as_completed(futures), start=1):
+            video_path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e: # the worker process itself died
+                summary = {'video_path': video_path, 'status': 'failed', 'error': repr(e)}
+            summaries[video_path] = summary
+
+            if summary['status'] == 'ok':
+                print(f"[{count}/{len(video_paths)}] {video_path}: {summary['detections']} detections, "
+                      f"{summary['frames_per_s']} frames/s")
+            else:
+                print(f"[{count}/{len(video_paths)}] {video_path}: FAILED\n{summary['error']}")
+
+    summaries = [summaries[video_path] for video_path in video_paths]
+    print_summary(summaries)
+    return summaries
+
+def print_summary(summaries):
+    ''' prints the number of successful and failed videos and the overall throughput of run_batch '''
+    succeeded = [summary for summary in summaries if summary['status'] == 'ok']
+    frames = sum(summary['frames'] for summary in succeeded)
+    elapsed = sum(summary['elapsed_s'] for summary in succeeded)
+    print(f"{len(succeeded)} of {len(summaries)} videos processed, {len(summaries) - len(succeeded)} failed")
+    if elapsed:
+        print(f"{frames} frames in {round(elapsed, 2)}s of worker time: {round(frames / elapsed, 2)} frames/s per worker")
+    for summary in summaries:
+        if summary['status'] != 'ok':
+            print(f"failed: {summary['video_path']}")
+
+
+if __name__ == '__main__':
+    # Run file from root of repository, e.g. python -m cursor_tracker.batch weights/best.pt data/videos --workers 4
+    import argparse
+    parser = argparse.ArgumentParser(description="Detect cursors in every recording of a directory or manifest")
+    parser.add_argument('weights_path')
+    parser.add_argument('source', help="directory of videos, or text file with one video path per line")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--sample-fps', type=float, default=None)
+    parser.add_argument('--no-render', action='store_true')
+    parser.add_argument('--output-dir', default='results')
+    args = parser.parse_args()
+    run_batch(args.weights_path, args.source, workers=args.workers, threads_per_worker=args.threads_per_worker,
+              output_dir=args.output_dir, sample_fps=args.sample_fps, render=not args.no_render, output_format='jsonl')
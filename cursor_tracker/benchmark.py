@@ -0,0 +1,131 @@
+# Reproducible benchmark of the tracker pipeline on synthetic recordings
+
+import json
+import os
+import time
+import numpy as np
+
+from cursor_detection.dataset_generation import generate_synthetic_video, synthetic_cursor_path
+from cursor_tracker.profiling import StageTimer
+from cursor_tracker.run import generate_results
+
+# generate_results settings compared by default, each labelled by its 'name'
+DEFAULT_CONFIGS = [
+    {'name': 'baseline'},
+    {'name': 'pipelined', 'pipelined': True, 'batch_size': 8},
+    {'name': 'gated', 'pipelined': True, 'batch_size': 8, 'motion_threshold': 8},
+    {'name': 'roi', 'pipelined': True, 'track_roi': 320},
+]
+
+def benchmark_pipeline(model, duration_s=60, fps=10, width=1920, height=1080, configs=None, seed=0,
+                       report_path=None, **kwargs):
+    '''
+    Runs generate_results once per config on a synthetic recording
+    (see cursor_detection.dataset_generation.generate_synthetic_video, drawn with an arrow cursor),
+    timing every stage with a profiling.StageTimer
+
+    model: YOLO model, or path to weights
+    configs: list of generate_results keyword arguments, each with a 'name' (default DEFAULT_CONFIGS)
+    kwargs: passed to every generate_results call; the annotated video is skipped unless render=True is given
+    report_path: defaults to results/benchmark_<width>x<height>_<duration_s>s_<fps>fps_seed<seed>.json
+
+    Prints and saves a report of total and per-stage frames/s for each config, and returns it
+    '''
+    if isinstance(model, str):
+        from ultralytics import YOLO
+        model = YOLO(model)
+    configs = DEFAULT_CONFIGS if configs is None else configs
+    kwargs.setdefault('render', False)
+
+    os.makedirs('results', exist_ok=True)
+    video_name = f"benchmark_{width}x{height}_{duration_s}s_{fps}fps_seed{seed}"
+    video_path = os.path.join('results', video_name + '.mp4')
+    if not os.path.exists(video_path):
+        generate_synthetic_video(video_name, desired_width=width, desired_height=height, fps=fps, duration_sec=duration_s,
+                                 cursor_file_name=None, seed=seed, output_dir='results')
+    if report_path is None:
+        report_path = os.path.join('results', f"{video_name}.json")
+
+    report = {'video': {'path': video_path, 'duration_s': duration_s, 'fps': fps, 'width': width, 'height': height},
+              'configs': {}}
+    for config in configs:
+        config = dict(config)
+        name = config.pop('name')
+        timer = StageTimer()
+        start = time.perf_counter()
+        detections = generate_results(model, video_path, timer=timer, **{**kwargs, **config})
+        sum(1 for _ in detections) # consume streamed outputs
+        elapsed = time.perf_counter() - start
+
+        frames = timer.counters.get('frames', 0)
+        report['configs'][name] = {'settings': config, 'seconds': round(elapsed, 3),
+                                   'frames_per_s': round(frames / elapsed, 2) if elapsed else None,
+                                   'realtime_factor': round(duration_s / elapsed, 2) if elapsed else None,
+                                   **timer.report(frames)}
+        print(f"--- {name}: {report['configs'][name]['frames_per_s']} frames/s ---")
+        timer.print_report(frames)
+
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Benchmark report saved to {report_path}")
+    return report
+
+def make_synthetic_trajectory(n_points:int, fps=10, width=1920, height=1280, seed=0):
+    ''' returns n_points cursor positions of dataset_generation.synthetic_cursor_path, as a list of (time, (x, y)) '''
+    positions, _ = synthetic_cursor_path(n_points, fps, width, height, np.random.default_rng(seed))
+    return [(round(i * 1000 / fps), (float(x), float(y))) for i, (x, y) in enumerate(positions.tolist())]
+
+def benchmark_animation(n_points=300, long_points=36000, max_frames=300, width=1920, height=1280, seed=0,
+                        report_path=None):
+    '''
+    Compares visualise_results.plot_3D_animation with render_3D_animation (max_frames frames) on n_points,
+    then times render_3D_animation alone on long_points (an hour at 10 frames/s), which plot_3D_animation
+    cannot render in reasonable time. Peak memory is measured with tracemalloc, so it covers python and numpy 
+    allocations, not the buffers of matplotlib's Pillow writer
+
+    Prints and saves a report to results/benchmark_animation.json (or report_path), and returns it
+    '''
+    import tracemalloc
+    import matplotlib.pyplot as plt
+    from cursor_tracker.visualise_results import plot_3D_animation, render_3D_animation
+
+    os.makedirs('results', exist_ok=True)
+    if report_path is None:
+        report_path = os.path.join('results', 'benchmark_animation.json')
+    runs = [('plot_3D_animation', n_points, lambda data, path: plot_3D_animation(data, height, width, path)),
+            ('render_3D_animation', n_points, lambda data, path: render_3D_animation(data, height, width, path, max_frames)),
+            ('render_3D_animation', long_points, lambda data, path: render_3D_animation(data, height, width, path, max_frames))]
+
+    report = {}
+    for name, points, render in runs:
+        data = make_synthetic_trajectory(points, width=width, height=height, seed=seed)
+        path = os.path.join('results', f"benchmark_{name}_{points}.gif")
+        tracemalloc.start()
+        start = time.perf_counter()
+        render(data, path)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        plt.close('all')
+        report[f"{name}_{points}"] = {'points': points, 'seconds': round(elapsed, 3),
+                                      'peak_memory_mb': round(peak / 1e6, 1), 'file_mb': round(os.path.getsize(path) / 1e6, 2)}
+        print(f"{name} on {points} points: {elapsed:.2f}s, peak memory {peak / 1e6:.1f}MB")
+
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Benchmark report saved to {report_path}")
+    return report
+
+
+if __name__ == '__main__':
+    # Run file from root of repository, e.g. python -m cursor_tracker.benchmark weights/best.pt --duration 120
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark generate_results on a synthetic recording")
+    parser.add_argument('weights_path')
+    parser.add_argument('--duration', type=int, default=60, help="length of the synthetic video in seconds")
+    parser.add_argument('--fps', type=int, default=10)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    benchmark_pipeline(args.weights_path, args.duration, args.fps, args.width, args.height, seed=args.seed)
@@ -0,0 +1,193 @@
+# Functions to save and load detections produced by cursor_tracker.run.generate_results
+
+import json
+import os
+import numpy as np
+
+# one row per detection, in a fixed-size binary layout that can be memory-mapped
+DETECTION_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('bbox', '<i4', (4,)),        # x1, y1, x2, y2
+    ('confidence', '<f4'),
+    ('class_id', '<i2'),          # index into the class names saved alongside
+    ('coordinates', '<f4', (2,)), # centre of the bounding box, as rounded to 2 decimals in the detection dictionary
+    ('coord_xy', '?'),            # whether the dictionary also had coord_x and coord_y, as max_det_1 detections do
+])
+
+def iter_detections(path:str):
+    '''
+    lazily yields the detection dictionaries stored in path, in the order they were saved
+    - .jsonl: one detection per line, read line by line. An incomplete last line (from an interrupted run) is ignored
+    - .json: a single list of detections, which is loaded at once
+    - .npy: a columnar detection array saved by save_detections, which is memory-mapped.
+      Detections have the keys of the saved dictionaries, with confidence stored as a 32 bit float
+    '''
+    if path.endswith('.npy'):
+        array, names = load_detections(path), load_class_names(path)
+        # arrays saved before coord_xy was stored never had it
+        has_coord_xy = 'coord_xy' in array.dtype.names
+        for row in array:
+            coordinates = (round(float(row['coordinates'][0]), 2), round(float(row['coordinates'][1]), 2))
+            detection = {
+                'timestamp': int(row['timestamp']),
+                'class_label': names[int(row['class_id'])],
+                'confidence': float(row['confidence']),
+                'bbox': row['bbox'].tolist(),
+                'coordinates': coordinates
+            }
+            if has_coord_xy and row['coord_xy']:
+                detection['coord_x'], detection['coord_y'] = coordinates
+            yield detection
+    elif path.endswith('.jsonl'):
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break # partially written record
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, 'r') as f:
+            yield from json.load(f)
+
+def read_checkpoint(checkpoint_path:str):
+    '''
+    returns the checkpoint saved by DetectionWriter at checkpoint_path, or None if there is none
+    '''
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, 'r') as f:
+        return json.load(f)
+
+class DetectionWriter:
+    '''
+    Appends detections to a newline-delimited json file as they are produced, 
+    and periodically records a checkpoint so an interrupted run can be resumed
+
+    The checkpoint at checkpoint_path stores the last processed timestamp and the file size at that point.
+    If resume is True, records written after the last checkpoint are discarded 
+    and last_timestamp is set to the checkpointed timestamp; otherwise path is overwritten
+    '''
+    def __init__(self, path:str, checkpoint_path:str, resume=False):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.last_timestamp = None
+        self.records = 0
+        self.complete = False
+
+        checkpoint = read_checkpoint(checkpoint_path) if resume else None
+        if checkpoint is not None and os.path.exists(path):
+            self.last_timestamp = checkpoint['timestamp']
+            self.records = checkpoint['records']
+            self.complete = checkpoint['complete']
+            # drop records written after the checkpoint, and write from there, so tell() is the end of the saved records
+            self.file = open(path, 'r+b')
+            self.file.truncate(checkpoint['offset'])
+            self.file.seek(checkpoint['offset'])
+        else:
+            self.file = open(path, 'wb')
+            self.checkpoint(None)
+
+    def write(self, detections):
+        ''' appends a list of detection dictionaries '''
+        for detection in detections:
+            self.file.write((json.dumps(detection) + '\n').encode())
+        self.records += len(detections)
+
+    def checkpoint(self, timestamp, complete=False):
+        ''' marks every detection up to and including timestamp as saved '''
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        checkpoint = {'timestamp': self.last_timestamp, 'offset': self.file.tell(), 
+                      'records': self.records, 'complete': complete}
+        # write to a temporary file first so the checkpoint is never left half written
+        with open(self.checkpoint_path + '.tmp', 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+
+    def close(self, timestamp=None):
+        ''' records a final checkpoint marking the run as complete, and closes the file '''
+        self.checkpoint(timestamp, complete=True)
+        self.file.close()
+
+def detections_to_array(detections, class_names=None):
+    '''
+    converts an iterable of detection dictionaries into a DETECTION_DTYPE array
+    class_names: dictionary of class_id: class_label to use. Labels not in it are given new ids
+
+    returns (array, class_names) where class_names includes every label in detections
+    '''
+    class_names = dict(class_names or {})
+    class_ids = {label: class_id for class_id, label in class_names.items()}
+
+    def row(detection):
+        label = detection['class_label']
+        if label not in class_ids:
+            class_ids[label] = len(class_names)
+            class_names[class_ids[label]] = label
+        return (detection['timestamp'], detection['bbox'], detection['confidence'], 
+                class_ids[label], detection['coordinates'], 'coord_x' in detection)
+
+    array = np.fromiter(map(row, detections), dtype=DETECTION_DTYPE)
+    return array, class_names
+
+def _class_names_path(path:str):
+    return path.rsplit('.', 1)[0] + '_names.json'
+
+def save_detections(array, class_names, path:str):
+    '''
+    saves a DETECTION_DTYPE array to path (.npy), and its class_names to <path>_names.json
+    '''
+    np.save(path, array)
+    with open(_class_names_path(path), 'w') as f:
+        json.dump({str(class_id): label for class_id, label in class_names.items()}, f)
+
+def load_detections(path:str, mmap=True):
+    '''
+    loads a DETECTION_DTYPE array saved by save_detections. 
+    if mmap, the file is memory-mapped, so only the columns and rows used are read from disk
+    columns are accessed by name, e.g. array['timestamp'], array['bbox'], array['coordinates']
+    '''
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+def load_class_names(path:str):
+    ''' returns the dictionary of class_id: class_label saved alongside the detections at path '''
+    with open(_class_names_path(path), 'r') as f:
+        return {int(class_id): label for class_id, label in json.load(f).items()}
+
+def convert_detections(source_path:str, dest_path:str):
+    '''
+    converts detections saved as .json or .jsonl into the columnar .npy format at dest_path
+    '''
+    array, class_names = detections_to_array(iter_detections(source_path))
+    save_detections(array, class_names, dest_path)
+    print(f"{len(array)} detections saved to {dest_path}")
+
+class ArrayDetectionWriter:
+    '''
+    Collects detections into DETECTION_DTYPE arrays as they are produced,
+    and saves them to path with save_detections when closed
+    '''
+    def __init__(self, path:str, chunk_size=65536):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.pending = []
+        self.class_names = {}
+
+    def write(self, detections):
+        ''' appends a list of detection dictionaries '''
+        self.pending.extend(detections)
+        if len(self.pending) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        # keep only compact arrays, rather than dictionaries, for the length of the run
+        chunk, self.class_names = detections_to_array(self.pending, self.class_names)
+        self.chunks.append(chunk)
+        self.pending = []
+
+    def close(self, timestamp=None):
+        self._flush()
+        save_detections(np.concatenate(self.chunks), self.class_names, self.path)
@@ -0,0 +1,113 @@
+# Extraction of many frames from one video in a single forward pass, for reports and visualisations
+
+import math
+from collections import OrderedDict
+
+import cv2
+
+class FrameExtractor:
+    '''
+    Decodes frames of video_path at given times, resized to width x height, keeping one capture open
+
+    prefetch(times) sorts the times and decodes them in one forward pass: frames between two requested times are
+    grabbed without being decoded into images, and the capture only seeks (with CAP_PROP_POS_MSEC, like get_one_frame)
+    to go back in time or to skip more than max_gap_ms ahead.
+    Decoded frames are kept in a least recently used cache of at most max_bytes, so frames shared between plots
+    are decoded once.
+
+    The frame at time_ms is the frame starting nearest to time_ms, as cap.set(cv2.CAP_PROP_POS_MSEC, time_ms) gives.
+    Use as a context manager, or call release() when done.
+    '''
+    def __init__(self, video_path:str, width=1920, height=1280, max_bytes=512 * 1024 * 1024, max_gap_ms=10000):
+        self.video_path = video_path
+        self.width = width
+        self.height = height
+        self.max_bytes = max_bytes
+        self.max_gap_ms = max_gap_ms
+        self.cache = OrderedDict() # time_ms: frame
+        self.cached_bytes = 0
+        self.decoded = 0           # number of frames decoded into images, for checking the cache is doing its job
+
+        self._cap = None
+        self._time = None          # timestamp of the last grabbed frame
+        self._frame = None         # that frame, once retrieved
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def prefetch(self, times):
+        ''' decodes the frames at every time in times that is not cached yet, in one pass in order of time '''
+        for time_ms in sorted(set(times) - set(self.cache)):
+            self._store(time_ms, self._decode(time_ms))
+
+    def frame(self, time_ms):
+        ''' returns the frame at time_ms (BGR, as cv2 reads it) '''
+        if time_ms in self.cache:
+            self.cache.move_to_end(time_ms)
+            return self.cache[time_ms]
+        frame = self._decode(time_ms)
+        self._store(time_ms, frame)
+        return frame
+
+    def frames(self, times):
+        ''' returns the frames at times, in the order given, decoding them in one pass '''
+        times = list(times)
+        self.prefetch(times)
+        return [self.frame(time_ms) for time_ms in times]
+
+    def loop_crop(self, loop_info):
+        '''
+        returns the part of the frame in the middle of a loop inside its bounding box,
+        as get_loop_bounding_box shows it (y of loop_info counted from the bottom, as after post_process_data)
+        '''
+        frame = self.frame((loop_info['start_time'] + loop_info['end_time']) // 2)
+        bbox = loop_info['bounding_box']
+        return frame[math.floor(self.height - bbox['max_y']):math.ceil(self.height - bbox['min_y']),
+                     math.floor(bbox['min_x']):math.ceil(bbox['max_x'])]
+
+    def loop_crops(self, loop_infos):
+        ''' returns loop_crop of each loop of loop_infos, decoding all their frames in one pass '''
+        loop_infos = list(loop_infos)
+        self.prefetch((info['start_time'] + info['end_time']) // 2 for info in loop_infos)
+        return [self.loop_crop(info) for info in loop_infos]
+
+    def _decode(self, time_ms):
+        if self._cap is None:
+            self._cap = cv2.VideoCapture(self.video_path)
+            if not self._cap.isOpened():
+                raise ValueError(f"Could not open {self.video_path}")
+            self._frame_ms = 1000 / (self._cap.get(cv2.CAP_PROP_FPS) or 30)
+        if self._time is None or time_ms < self._time or time_ms - self._time > self.max_gap_ms:
+            self._cap.set(cv2.CAP_PROP_POS_MSEC, time_ms)
+            self._time, self._frame = None, None
+
+        # grab forward to the frame starting nearest to time_ms
+        while self._time is None or self._time + self._frame_ms / 2 <= time_ms:
+            if not self._cap.grab():
+                self._time, self._frame = None, None
+                raise ValueError(f"No frame at {time_ms}ms in {self.video_path}")
+            self._time = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+            self._frame = None
+
+        if self._frame is None:
+            _, frame = self._cap.retrieve()
+            self._frame = cv2.resize(frame, (self.width, self.height))
+            self.decoded += 1
+        return self._frame
+
+    def _store(self, time_ms, frame):
+        if time_ms in self.cache:
+            return
+        self.cache[time_ms] = frame
+        self.cached_bytes += frame.nbytes
+        while self.cached_bytes > self.max_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted.nbytes
@@ -0,0 +1,76 @@
+# Timers and counters to see where time goes in the tracker pipeline
+
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+class StageTimer:
+    '''
+    Accumulates wall-clock time and call counts per named stage, plus free-form counters.
+    Safe to share between the threads of a pipelined run; stages on different threads overlap,
+    so their times can add up to more than the total run time.
+
+    if enabled is False, stage() and count() do nothing, so instrumented code costs almost nothing
+    '''
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.times = {}
+        self.calls = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def stage(self, name:str):
+        ''' context manager adding the time spent inside it to stage name '''
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.times[name] = self.times.get(name, 0.0) + elapsed
+                self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name:str, n=1):
+        ''' adds n to counter name '''
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self, frames=None):
+        '''
+        returns a dictionary of total seconds, stages and counters
+        each stage has seconds, calls and ms_per_call, and frames_per_s if frames is given
+        '''
+        stages = {}
+        for name, seconds in self.times.items():
+            stages[name] = {'seconds': round(seconds, 4), 'calls': self.calls[name],
+                            'ms_per_call': round(1000 * seconds / self.calls[name], 3)}
+            if frames:
+                stages[name]['frames_per_s'] = round(frames / seconds, 2) if seconds else None
+        return {'total_seconds': round(time.perf_counter() - self._start, 4),
+                'stages': stages, 'counters': dict(self.counters)}
+
+    def print_report(self, frames=None):
+        ''' prints report() as a table, slowest stage first '''
+        report = self.report(frames)
+        print(f"total: {report['total_seconds']}s")
+        for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            line = f"{name:>15}: {stage['seconds']:>9.3f}s {stage['calls']:>8} calls {stage['ms_per_call']:>9.3f} ms/call"
+            if 'frames_per_s' in stage:
+                line += f" {stage['frames_per_s']} frames/s"
+            print(line)
+        for name, value in report['counters'].items():
+            print(f"{name:>15}: {value}")
+
+    def save(self, path:str, frames=None):
+        ''' saves report() as json to path '''
+        with open(path, 'w') as f:
+            json.dump(self.report(frames), f, indent=4)
@@ -1,107 +1,484 @@
 import cv2
 import json
+import os
+import queue
+import threading
 
-def generate_results(model, video_path:str, frame_width=1920, frame_height=1280, max_det_1 = True, DEBUG=False):
+from cursor_tracker.detection_io import ArrayDetectionWriter, DetectionWriter, iter_detections, load_detections
+from cursor_tracker.profiling import StageTimer
+
+def generate_results(model, video_path:str, frame_width=1920, frame_height=1280, max_det_1 = True, DEBUG=False,
+                     pipelined=False, batch_size=1, queue_size=64,
+                     motion_threshold=None, redetect_every=30,
+                     track_roi=None, min_track_confidence=0.5,
+                     output_format='json', resume=False, checkpoint_every=100,
+                     render=True, sample_fps=None, timer=None, on_detections=None, output_dir='results'):
+    '''
+    Runs model on every frame of video_path, saves the detections to output_dir as json and, if render, an annotated video
+
+    pipelined: decode frames on a background thread and encode the annotated video on another, 
+               so that decoding, inference and encoding overlap
+    batch_size: number of frames passed to model([...]) in a single call
+    queue_size: maximum number of frames buffered between the stages when pipelined
+    motion_threshold: if set, skips the model on frames whose downscaled greyscale difference 
+                      with the last detected frame stays within motion_threshold (0-255), 
+                      reusing the last detection instead
+    redetect_every: when motion_threshold is set, forces the model to run at least once every redetect_every frames
+    track_roi: if set, runs the model on a track_roi x track_roi crop centred on the last detection (at imgsz=track_roi),
+               falling back to the full frame when there is no previous detection or 
+               the best detection in the crop is below min_track_confidence. 
+               Frames are then detected one at a time, as each crop depends on the previous frame
+    output_format: 'json' keeps all detections in memory and saves them as one json list at the end (returns the list)
+                   'jsonl' appends detections to a newline-delimited json file as they are produced, 
+                   checkpointing every checkpoint_every frames (returns a lazy iterator over the saved detections)
+                   'npy' saves detections as a columnar array that can be memory-mapped (see detection_io.load_detections)
+                   and returns that array
+    resume: with output_format='jsonl', continues an interrupted run from its last checkpointed timestamp.
+            The annotated video then only covers the resumed part of the recording, 
+            so use render=False and render_detections once the run completes
+    render: writes every frame, with its detections drawn, to <output_dir>/<video_name>_predictions.mp4
+            (on its own thread when pipelined). Use render_detections to render from saved detections instead
+    sample_fps: if set, only decodes the first frame in every 1/sample_fps seconds of the recording, 
+                skipping the rest without decoding them. Timestamps remain those of the original recording
+    timer: a profiling.StageTimer to record the time spent in each stage (decode, resize, gate, inference, 
+           device_copy, postprocess, write, render) and counters of frames, model calls and detections.
+           Use timer.print_report() or timer.save(path) afterwards
+    on_detections: optional function called with the list of detections of each frame, in order, as soon as they are produced,
+                   e.g. motion_analysis.online.OnlineMotionAnalyser(...).feed_detections to analyse motion live
+    output_dir: directory the outputs are named in from the video's name, created if missing.
+                Videos with the same name overwrite each other's outputs unless given different output_dirs
+
+    Detections are identical regardless of pipelined and batch_size
+    '''
     video_name = video_path.split('/')[-1].split('.')[0]
+    if timer is None:
+        timer = StageTimer(enabled=False)
+    if output_format not in ('json', 'jsonl', 'npy'):
+        raise ValueError(f"Unsupported output_format: {output_format}")
+    if resume and output_format != 'jsonl':
+        raise ValueError("resume is only supported with output_format='jsonl'")
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{video_name}_{'max_detection' if max_det_1 else 'all_detections'}.{output_format}")
+
+    writer = None
+    if output_format == 'jsonl':
+        writer = DetectionWriter(output_file, output_file.rsplit('.', 1)[0] + '_checkpoint.json', resume=resume)
+        if writer.complete:
+            writer.file.close()
+            print(f"Detections already saved to {output_file}")
+            return iter_detections(output_file)
+        if writer.last_timestamp is not None:
+            print(f"Resuming after time {writer.last_timestamp} with {writer.records} detections saved")
+    elif output_format == 'npy':
+        writer = ArrayDetectionWriter(output_file)
+
     cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v') 
-    out = cv2.VideoWriter('results/'+video_name+'_predictions.mp4', fourcc, fps, (frame_width, frame_height), True)
+    renderer = None
+    if render:
+        renderer = DetectionRenderer(os.path.join(output_dir, video_name+'_predictions.mp4'), output_fps(cap, sample_fps), 
+                                     (frame_width, frame_height), threaded=pipelined, queue_size=queue_size, timer=timer)
+
+    frames = read_frames(cap, frame_width, frame_height, start_after=writer.last_timestamp if resume else None, 
+                         sample_fps=sample_fps, timer=timer)
+    gate_stats = {'frames': 0, 'skipped': 0}
+    frames = gate_frames(frames, motion_threshold, redetect_every, gate_stats, timer=timer)
+    if pipelined:
+        frames = run_in_thread(frames, queue_size)
 
-    # Create a list to store detection results
+    # Create a list to store detection results, unless they are streamed to the writer
     detections = []
+    frames_processed = 0
+    last_detections = [] # detections of the last frame the model was run on
+
+    # a batch holds batch_size frames to detect on, plus any unchanged frames between them
+    for batch in batched(frames, batch_size, queue_size, is_counted=lambda item: not item[2]):
+        # Perform object detection using YOLOv8
+        to_detect = [frame for _, frame, skip in batch if not skip]
+        if track_roi is None and to_detect:
+            with timer.stage('inference'):
+                results = iter(model(to_detect, verbose=False))
+            timer.count('model_calls')
+            timer.count('frames_inferred', len(to_detect))
+
+        for timestamp, frame, skip in batch:
+            if skip:
+                # frame is unchanged, so reuse the last detection
+                frame_detections = [dict(detection, timestamp=timestamp) for detection in last_detections]
+                if DEBUG: print(f"time: {timestamp}, unchanged frame, {len(frame_detections)} detections reused")
+            else:
+                if track_roi is None:
+                    result = next(results)
+                    frame_detections = extract_detections(result, timestamp, max_det_1, timer=timer)
+                else:
+                    result, frame_detections = track_detections(model, frame, timestamp, last_detections, 
+                                                                track_roi, min_track_confidence, max_det_1, timer=timer)
+                last_detections = frame_detections
+
+                if DEBUG: print(f"time: {timestamp}, {len(result.boxes.xyxy)} detections")
+                if DEBUG and max_det_1 and len(result.boxes.cls) > 1: # multiple detections
+                    print(f"time: {timestamp}, {len(result.boxes.cls)} detections")
+
+            with timer.stage('write'):
+                if writer is None:
+                    # Append frame detections to the list of detections
+                    detections.extend(frame_detections)
+                else:
+                    writer.write(frame_detections)
+            if on_detections is not None:
+                on_detections(frame_detections)
+            if DEBUG:
+                for detection in frame_detections:
+                    print(f"{detection['coordinates']} added to detections for time {timestamp}")
+
+            if renderer is not None:
+                renderer.write(frame, frame_detections)
+
+            frames_processed += 1
+            timer.count('frames')
+            timer.count('detections', len(frame_detections))
+            if output_format == 'jsonl' and frames_processed % checkpoint_every == 0:
+                with timer.stage('write'):
+                    writer.checkpoint(timestamp)
+
+    cap.release()
+    if renderer is not None:
+        renderer.release()
+    cv2.destroyAllWindows()
+
+    if motion_threshold is not None:
+        print(f"Skipped model on {gate_stats['skipped']} of {gate_stats['frames']} unchanged frames")
+
+    if writer is not None:
+        with timer.stage('write'):
+            writer.close(timestamp if frames_processed else None)
+        print(f"Detections saved to {output_file}")
+        return iter_detections(output_file) if output_format == 'jsonl' else load_detections(output_file)
+
+    # Save detections to a JSON file
+    with timer.stage('write'), open(output_file, 'w') as json_file:
+        json.dump(detections, json_file, indent=4)
+
+    print(f"Detections saved to {output_file}")
+    return detections
+
+def extract_detections(result, timestamp:int, max_det_1=True, offset=(0, 0), timer=None):
+    '''
+    converts one YOLOv8 result into a list of detection dictionaries for timestamp
+    if max_det_1, returns at most one detection: the one with the best confidence
+    offset: (x, y) added to every box, for results of a crop whose top left corner is at offset
+    timer: optional profiling.StageTimer
+    '''
+    if timer is None:
+        timer = StageTimer(enabled=False)
+
+    # copy boxes from the device once per frame rather than once per box
+    with timer.stage('device_copy'):
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy()
+        confidences = boxes.conf.cpu().numpy()
+        classes = boxes.cls.cpu().numpy()
+    with timer.stage('postprocess'):
+        return _to_detections(result.names, xyxy, confidences, classes, timestamp, max_det_1, offset)
+
+def _to_detections(names, xyxy, confidences, classes, timestamp, max_det_1, offset):
+    ''' builds the detection dictionaries of extract_detections from box arrays '''
+    if max_det_1:
+        if len(confidences) == 0: # will have empty values
+            return []
+        indices = [int(confidences.argmax())] # chooses only result with best confidence
+    else:
+        indices = range(len(confidences))
+
+    detections = []
+    for i in indices:
+        x1, y1, x2, y2 = map(float, xyxy[i])
+        x1, y1, x2, y2 = x1 + offset[0], y1 + offset[1], x2 + offset[0], y2 + offset[1]
+        coordinate = (round((x1+x2)/2, 2), round((y1+y2)/2, 2))
+        detection = {
+                'timestamp': timestamp,
+                'class_label': names[int(classes[i])],
+                'confidence': float(confidences[i]) if max_det_1 else round(float(confidences[i]), 2),
+                'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                'coordinates': coordinate
+            }
+        if max_det_1:
+            detection['coord_x'], detection['coord_y'] = coordinate
+        detections.append(detection)
+    return detections
+
+def track_detections(model, frame, timestamp:int, last_detections, roi_size:int, min_confidence:float, max_det_1=True, 
+                     timer=None):
+    '''
+    runs model on a roi_size x roi_size crop of frame centred on the best of last_detections,
+    and maps the boxes found back to frame coordinates
+
+    falls back to running model on the whole frame if last_detections is empty, 
+    or if no detection in the crop reaches min_confidence
+    returns (result, detections) where result is the YOLOv8 result of the last model call
+    timer: optional profiling.StageTimer
+    '''
+    if timer is None:
+        timer = StageTimer(enabled=False)
+
+    if last_detections:
+        x1, y1, x2, y2 = max(last_detections, key=lambda d: d['confidence'])['bbox']
+        frame_h, frame_w = frame.shape[:2]
+        crop_w, crop_h = min(roi_size, frame_w), min(roi_size, frame_h)
+        # keep the crop within the frame
+        left = min(max((x1+x2)//2 - crop_w//2, 0), frame_w - crop_w)
+        top = min(max((y1+y2)//2 - crop_h//2, 0), frame_h - crop_h)
+
+        with timer.stage('inference'):
+            result = model([frame[top:top+crop_h, left:left+crop_w]], verbose=False, imgsz=roi_size)[0]
+        timer.count('model_calls')
+        timer.count('roi_calls')
+        detections = extract_detections(result, timestamp, max_det_1, offset=(left, top), timer=timer)
+        if detections and max(d['confidence'] for d in detections) >= min_confidence:
+            return result, detections
+
+    # cursor lost, search the whole frame
+    with timer.stage('inference'):
+        result = model([frame], verbose=False)[0]
+    timer.count('model_calls')
+    return result, extract_detections(result, timestamp, max_det_1, timer=timer)
 
+def draw_detection(frame, detection):
+    ''' draws the bounding box and confidence of detection onto frame in place '''
+    x1, y1, x2, y2 = detection['bbox']
+    color = (0, 255, 0)  # Green color for the bounding box
+    label = f"Confidence: {detection['confidence']:.2f}"
+    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+    cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+# define helper functions for the detection pipeline
+def read_frames(cap, frame_width:int, frame_height:int, start_after=None, sample_fps=None, timer=None):
+    '''
+    yields (timestamp, frame) for each frame of cap, with the frame resized to frame_width x frame_height
+    if start_after is given, frames up to and including that timestamp are skipped without being decoded
+    if sample_fps is given, only the first frame in every 1/sample_fps seconds is decoded, 
+    the others are grabbed and skipped
+    timer: optional profiling.StageTimer, timing decode and resize
+    '''
+    if timer is None:
+        timer = StageTimer(enabled=False)
+
+    # the frame at start_after was the one sampled from its slot, so later frames of that slot are skipped too
+    last_slot = start_after * sample_fps // 1000 if start_after is not None and sample_fps is not None else None
     while True:
         # Read a frame from the video
-        ret, frame = cap.read()
+        with timer.stage('decode'):
+            grabbed = cap.grab()
+        if not grabbed:
+            break
+        timestamp = int(cap.get(cv2.CAP_PROP_POS_MSEC))
+        if start_after is not None and timestamp <= start_after:
+            continue
+        if sample_fps is not None:
+            slot = timestamp * sample_fps // 1000
+            if slot == last_slot:
+                continue
+            last_slot = slot
+        with timer.stage('decode'):
+            ret, frame = cap.retrieve()
         if not ret:
             break
+        with timer.stage('resize'):
+            frame = cv2.resize(frame, (frame_width,frame_height)) # width and height flipped
+        yield timestamp, frame
 
-        frame = cv2.resize(frame, (frame_width,frame_height)) # width and height flipped
+def output_fps(cap, sample_fps=None):
+    ''' returns the frame rate of cap after sampling at sample_fps '''
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    return fps if sample_fps is None else min(fps, sample_fps)
 
-        # Perform object detection using YOLOv8
-        results = model(frame, verbose=False)
-        timestamp = int(cap.get(cv2.CAP_PROP_POS_MSEC))
+def gate_frames(frames, threshold, redetect_every:int, stats:dict, size=(64, 40), timer=None):
+    '''
+    takes in (timestamp, frame) and yields (timestamp, frame, skip)
+    skip is True when the frame, downscaled to size in greyscale, differs from the last frame 
+    that was not skipped by at most threshold at every pixel. 
+    At most redetect_every - 1 consecutive frames are skipped.
+    if threshold is None, no frame is skipped
+    
+    counts frames and skipped frames into stats['frames'] and stats['skipped']
+    timer: optional profiling.StageTimer
+    '''
+    if timer is None:
+        timer = StageTimer(enabled=False)
+
+    reference = None
+    since_reference = 0
+    for timestamp, frame in frames:
+        stats['frames'] += 1
+        if threshold is None:
+            yield timestamp, frame, False
+            continue
 
-        if DEBUG: print(f"time: {timestamp}, {len(results[0].boxes.xyxy)} detections")
-
-        if not max_det_1:
-            for i in range(len(results[0].boxes.xyxy)):
-                bboxes = results[0].boxes.xyxy[i].cpu().numpy()
-                class_label = results[0].names[int(results[0].boxes.cls.numpy()[i])]
-                confidences = float(results[0].boxes.conf.cpu().numpy()[i]) 
-
-                # Prepare detection data for the frame
-                x1, y1, x2, y2 = bboxes[0], bboxes[1], bboxes[2], bboxes[3]
-                coordinate = (round((x1+x2)/2, 2), round((y1+y2)/2, 2))
-                detection = {
-                        'timestamp': timestamp,
-                        'class_label': class_label,
-                        'confidence': round(confidences, 2),
-                        'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                        'coordinates': coordinate
-                    }
-                # Append frame detections to the list of detections
-                detections.append(detection)
-
-                if DEBUG: print(f"{coordinate} added to detections for time {timestamp}")
-
-        # only take the best detection
+        with timer.stage('gate'):
+            small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), size, interpolation=cv2.INTER_AREA)
+            since_reference += 1
+            # compare against the last detected frame so that slow movement still accumulates
+            skip = reference is not None and since_reference < redetect_every and \
+                int(cv2.absdiff(small, reference).max()) <= threshold
+        if skip:
+            stats['skipped'] += 1
+            timer.count('frames_skipped')
         else:
+            reference = small
+            since_reference = 0
+        yield timestamp, frame, skip
 
-            if DEBUG and len(results[0].boxes.cls) > 1: # multiple detections
-                print(f"time: {timestamp}, {len(results[0].boxes.cls)} detections")
+def batched(iterable, batch_size:int, max_size=None, is_counted=None):
+    '''
+    yields lists of consecutive items of iterable, each holding up to batch_size items for which is_counted(item) is True
+    (every item if is_counted is None), and at most max_size items in total
+    '''
+    batch = []
+    count = 0
+    for item in iterable:
+        batch.append(item)
+        if is_counted is None or is_counted(item):
+            count += 1
+        if count >= batch_size or (max_size is not None and len(batch) >= max_size):
+            yield batch
+            batch = []
+            count = 0
+    if batch:
+        yield batch
 
-            confidences = list(map(float, results[0].boxes.conf.cpu().numpy()))
+_END_OF_QUEUE = object()
 
-            if not confidences: # will have empty values
-                continue
+def run_in_thread(iterable, queue_size:int):
+    '''
+    consumes iterable on a background thread and yields its items in order through a bounded queue
+    exceptions raised by iterable are re-raised in the consuming thread
+    '''
+    items = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    error = []
 
-            # finds the best 
-            best_index = confidences.index(max(confidences)) # chooses only result with best confidence
-            bboxes = results[0].boxes.xyxy[best_index].cpu().numpy()
-            x1, y1, x2, y2 = bboxes[0], bboxes[1], bboxes[2], bboxes[3]
-            coordinate = ((x1+x2)/2, (y1+y2)/2)
-
-            # takes the best
-            bboxes = results[0].boxes.xyxy[best_index].cpu().numpy()
-            x1, y1, x2, y2 = bboxes[0], bboxes[1], bboxes[2], bboxes[3]
-            coordinate = (round((x1+x2)/2, 2), round((y1+y2)/2, 2))
-            detection = {
-                    'timestamp': timestamp,
-                    'class_label': results[0].names[int(results[0].boxes.cls.numpy()[best_index])],
-                    'confidence': confidences[best_index],
-                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                    'coordinates': coordinate,
-                    'coord_x': coordinate[0], 'coord_y': coordinate[1]
-                }
-            detections.append(detection)
-
-            if DEBUG: print(f"{coordinate} added to detections for time {timestamp}")
-            
-            # Prepare detection data for the frame
-            color = (0, 255, 0)  # Green color for the bounding box
-            label = f"Confidence: {confidences[best_index]:.2f}"
-            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-            cv2.putText(frame, label, (int(x1), int(y1 - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
-            out.write(frame)
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                items.put(item)
+        except BaseException as e:
+            error.append(e)
+        finally:
+            items.put(_END_OF_QUEUE)
 
-    cap.release()
-    out.release()
-    cv2.destroyAllWindows()
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END_OF_QUEUE:
+                break
+            yield item
+    finally:
+        # unblock the producer if the consumer stopped early
+        stop.set()
+        while thread.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    if error:
+        raise error[0]
 
-    # Save detections to a JSON file
-    if not max_det_1:
-        output_file = f'results/{video_name}_all_detections.json'
-    else:
-        output_file = f'results/{video_name}_max_detection.json'
+class DetectionRenderer:
+    '''
+    draws detections onto frames and encodes them into an mp4 video at output_path
+    if threaded, drawing and encoding happen on a background thread, 
+    and write() only blocks when queue_size frames are already waiting.
+    An exception raised while rendering on that thread is re-raised by the next write() or by release()
+    timer: optional profiling.StageTimer, timing render
+    '''
+    def __init__(self, output_path:str, fps:float, frame_size, threaded=False, queue_size=64, timer=None):
+        self.timer = timer if timer is not None else StageTimer(enabled=False)
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v') 
+        self.out = cv2.VideoWriter(output_path, fourcc, fps, frame_size, True)
+        self.thread = None
+        self.error = None
+        if threaded:
+            self.frames = queue.Queue(maxsize=queue_size)
+            self.thread = threading.Thread(target=self._consume, daemon=True)
+            self.thread.start()
 
-    with open(output_file, 'w') as json_file:
-        json.dump(detections, json_file, indent=4)
+    def _render(self, frame, detections):
+        with self.timer.stage('render'):
+            for detection in detections:
+                draw_detection(frame, detection)
+            self.out.write(frame)
 
-    print(f"Detections saved to {output_file}")
-    return detections
+    def _consume(self):
+        while True:
+            item = self.frames.get()
+            if item is _END_OF_QUEUE:
+                break
+            # after an error, keep taking frames so write() and release() never block on a full queue
+            if self.error is None:
+                try:
+                    self._render(*item)
+                except BaseException as e:
+                    self.error = e
+
+    def write(self, frame, detections):
+        ''' draws detections onto frame in place, and appends it to the video '''
+        if self.thread is None:
+            self._render(frame, detections)
+        else:
+            if self.error is not None:
+                raise self.error
+            self.frames.put((frame, detections))
+
+    def release(self):
+        if self.thread is not None:
+            self.frames.put(_END_OF_QUEUE)
+            self.thread.join()
+        self.out.release()
+        if self.error is not None:
+            raise self.error
+
+def render_detections(video_path:str, detections, output_path=None, frame_width=1920, frame_height=1280, 
+                      pipelined=True, queue_size=64, sample_fps=None):
+    '''
+    Renders an annotated video of video_path from detections saved by generate_results
+
+    detections: path to a .json/.jsonl file of detections, or a list of detection dictionaries, sorted by timestamp
+    output_path: defaults to results/<video_name>_predictions.mp4
+    frame_width, frame_height, sample_fps: must match those passed to generate_results
+    pipelined: decode and render on separate threads
+
+    Every frame of the video is written, with the detections of its timestamp drawn
+    '''
+    video_name = video_path.split('/')[-1].split('.')[0]
+    if output_path is None:
+        output_path = 'results/'+video_name+'_predictions.mp4'
+    if isinstance(detections, str):
+        detections = iter_detections(detections)
+
+    cap = cv2.VideoCapture(video_path)
+    renderer = DetectionRenderer(output_path, output_fps(cap, sample_fps), (frame_width, frame_height), 
+                                 threaded=pipelined, queue_size=queue_size)
+    frames = read_frames(cap, frame_width, frame_height, sample_fps=sample_fps)
+    if pipelined:
+        frames = run_in_thread(frames, queue_size)
+
+    # walk frames and detections together, as both are ordered by timestamp
+    detections = iter(detections)
+    detection = next(detections, None)
+    for timestamp, frame in frames:
+        frame_detections = []
+        while detection is not None and detection['timestamp'] <= timestamp:
+            if detection['timestamp'] == timestamp:
+                frame_detections.append(detection)
+            detection = next(detections, None)
+        renderer.write(frame, frame_detections)
+
+    cap.release()
+    renderer.release()
+    print(f"Annotated video saved to {output_path}")
 
 # define helper functions for cursor tracking
 def convert_FPS(source_path:str, dest_path:str, desired_fps:int) -> None:
@@ -109,6 +486,7 @@ def convert_FPS(source_path:str, dest_path:str, desired_fps:int) -> None:
     converts video in source_path to desired_fps, and saves as dest_path 
     assumes source video is of mp4 format
     does not re-sample the video but lengthens it
+    to detect on fewer frames of a recording, use generate_results(..., sample_fps=desired_fps) instead
     '''
     cap = cv2.VideoCapture(source_path)
 
@@ -142,6 +520,4 @@ if __name__ == '__main__':
     from ultralytics import YOLO
     model = YOLO("runs/detect/train26/weights/best.pt")
     video_path = "data/recordings/Youtube_section2.mp4"
-    new_video_path = 'data/recordings/Youtube_section2_10fps.mp4'
-    convert_FPS(video_path, new_video_path, 10)
-    generate_results(model, new_video_path, max_det_1 = True)
\ No newline at end of file
+    generate_results(model, video_path, max_det_1 = True, sample_fps = 10)
\ No newline at end of file
@@ -0,0 +1,100 @@
+# Compact array-backed cursor trajectories, in place of lists of (time, (x, y)) tuples
+
+import numpy as np
+
+class Trajectory:
+    '''
+    A cursor trajectory held as contiguous arrays: times of shape (N,) and points of shape (N, 2)
+    About 24 bytes per point, against roughly 200 for a (time, (x, y)) tuple in a list
+
+    Can be used wherever time_coord_raw or time_coord_data is taken in:
+    - iterating yields (time, (x, y)) tuples of python numbers, and trajectory[i] is one such tuple
+    - trajectory[a:b], between() and split() return Trajectories sharing memory with this one (no copy)
+    - sort(), flip_height() and group() change it in place
+    - range() and coords() answer time range queries by binary search, like motion_analysis.helper.TrajectoryIndex
+    '''
+    def __init__(self, times, points):
+        self.times = np.asarray(times, dtype=np.int64).reshape(-1)
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        assert len(self.times) == len(self.points), "times and points must have the same length"
+
+    @classmethod
+    def from_tuples(cls, time_coord_data):
+        ''' builds a Trajectory from a list of (time, (x, y)) tuples '''
+        time_coord_data = list(time_coord_data)
+        return cls([t for t, _ in time_coord_data], [c for _, c in time_coord_data])
+
+    @classmethod
+    def load(cls, path:str):
+        ''' loads the detections saved by generate_results at path (see visualise_results.get_time_coord_arrays) '''
+        from cursor_tracker.visualise_results import get_time_coord_arrays
+        timestamps, coordinates = get_time_coord_arrays(path)
+        return cls(np.array(timestamps, dtype=np.int64), np.array(coordinates, dtype=np.float64))
+
+    @property
+    def x(self):
+        return self.points[:, 0]
+
+    @property
+    def y(self):
+        return self.points[:, 1]
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        return zip(self.times.tolist(), map(tuple, self.points.tolist()))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Trajectory(self.times[key], self.points[key])
+        return (self.times[key].item(), tuple(self.points[key].tolist()))
+
+    def __repr__(self):
+        return f"Trajectory({len(self)} points)"
+
+    def copy(self):
+        return Trajectory(self.times.copy(), self.points.copy())
+
+    def to_list(self):
+        ''' returns the trajectory as a list of (time, (x, y)) tuples '''
+        return list(self)
+
+    def is_sorted(self):
+        return bool(np.all(self.times[1:] >= self.times[:-1]))
+
+    def sort(self):
+        ''' sorts points by time, keeping the order of equal times, and returns self '''
+        if not self.is_sorted():
+            order = np.argsort(self.times, kind='stable')
+            self.times = self.times[order]
+            self.points = self.points[order]
+        return self
+
+    def flip_height(self, height):
+        ''' replaces y by height - y, rounding coordinates to 2 decimals as post_process_data does, and returns self '''
+        np.subtract(height, self.points[:, 1], out=self.points[:, 1])
+        np.round(self.points, 2, out=self.points)
+        return self
+
+    def group(self, factor):
+        ''' floor divides coordinates by factor, as group_coordinates does, and returns self '''
+        np.floor_divide(self.points, factor, out=self.points)
+        return self
+
+    def split(self, threshold):
+        ''' returns a list of sections, split wherever consecutive times are more than threshold apart (times must be sorted) '''
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(self.times) > threshold) + 1, [len(self)]))
+        return [self[start:stop] for start, stop in zip(starts[:-1].tolist(), starts[1:].tolist())]
+
+    def between(self, start_time, end_time):
+        ''' returns the points with start_time <= time <= end_time (times must be sorted) '''
+        return self[np.searchsorted(self.times, start_time, side='left'):np.searchsorted(self.times, end_time, side='right')]
+
+    def range(self, start_time, end_time):
+        ''' returns the (time, (x, y)) tuples with start_time <= time <= end_time, as TrajectoryIndex.range '''
+        return self.between(start_time, end_time).to_list()
+
+    def coords(self, start_time, end_time):
+        ''' returns the (x, y) coordinates with start_time <= time <= end_time, as TrajectoryIndex.coords '''
+        return list(map(tuple, self.between(start_time, end_time).points.tolist()))
@@ -1,50 +1,91 @@
-def compare_results(prediction_path_json:str,actual_path_txt:str):
+def compare_results(prediction_path_json:str,actual_path_txt:str, tolerance_ms=0):
     '''
     take in two paths containing json data of model detection and actual results
-    - prints 
-        TP (correct model detection), FP (incorrect model detection) and 
+    prediction_path_json can be a .json list, a streamed .jsonl file or a columnar .npy file from generate_results
+    tolerance_ms: each actual timestamp is matched to the nearest predicted timestamp at most tolerance_ms away,
+                  e.g. half the frame interval when predictions were made at a different fps. 0 requires an exact match
+    - prints
+        TP (correct model detection), FP (incorrect model detection) and
         FN (cursor not detected by model). TN is always 0 as all frames have a cursor.
         accuracy (TP+TN/total) and precision (TP/TP+FP)
-    - returns a dataframe with actual versus predicted data
+    - returns a dataframe with actual versus predicted data, one row per matched prediction
+      (or one row with no prediction), with within_box marking correct detections
     '''
 
+    import numpy as np
     import pandas as pd
-    import json
-
-    # read the prediction json file
-    with open(prediction_path_json, 'r') as f:
-        prediction = json.load(f)
-    
-    # read the actual txt file
-    with open(actual_path_txt, 'r') as f:
-        actual = f.readlines()
-
-    # extract time, and bounding box x1, y1, x2, y2 from the prediction
-    prediction_time_bbox_raw = [(dct['timestamp'], tuple(dct['bbox'])) for dct in prediction]
-    # extract time, and x,y from the actual data
-    actual_time_coord_raw = [(line.split(',')[0], [int(line.split(',')[1]), int(line.split(',')[2])]) for line in actual]
-    
-    # convert the list to a dataframe with columns timestamp, coord, x, y
-    df = pd.DataFrame(actual_time_coord_raw, columns=['timestamp', 'coord'])
-    df[['actual_x', 'actual_y']] = pd.DataFrame(df['coord'].tolist(), index=df.index)
-    df['timestamp'] = df['timestamp'].astype('int64')
-
-    df_prediction = pd.read_json(json.dumps(prediction))
-    df_prediction[['pred_x1', 'pred_y1', 'pred_x2', 'pred_y2']] = pd.DataFrame(df_prediction['bbox'].tolist(), index=df_prediction.index)
-
-    df = pd.merge(df, df_prediction, on='timestamp', how='left')
-    df.drop(columns=['coord', 'coordinates', 'bbox', 'coord_x', 'coord_y'], inplace=True)
+
+    # read the actual txt file of time,x,y lines
+    actual = pd.read_csv(actual_path_txt, header=None, names=['timestamp', 'actual_x', 'actual_y'], dtype='int64')
+
+    # read the predictions as columns, sorted by timestamp
+    prediction = load_prediction_frame(prediction_path_json)
+    prediction = prediction.sort_values('pred_timestamp', kind='stable').reset_index(drop=True)
+    unique_times, starts, counts = np.unique(prediction['pred_timestamp'].to_numpy(), return_index=True, return_counts=True)
+
+    # index into unique_times of the prediction matched to each actual row, or -1
+    matched = match_timestamps(actual['timestamp'].to_numpy(), unique_times, tolerance_ms)
+
+    # expand to one row per (actual, prediction) pair, as a left join would
+    # the appended entries make index -1 select a single pair with no prediction
+    counts, starts = np.append(counts, 1), np.append(starts, -1)
+    n_pairs = counts[matched]
+    actual_index = np.repeat(np.arange(len(actual)), n_pairs)
+    offsets = np.arange(len(actual_index)) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+    first = np.repeat(starts[matched], n_pairs)
+    prediction_index = np.where(first >= 0, first + offsets, -1)
+
+    df = pd.concat([actual.iloc[actual_index].reset_index(drop=True),
+                    prediction.reindex(prediction_index).reset_index(drop=True)], axis=1)
 
     # Get stats
-    TP, FP = 0, 0
-    FN = df.loc[df['class_label'].isnull()].shape[0] # number of rows
-    filtered_df = df.loc[df['class_label'].notnull()].reset_index(drop=True)
-    
-    filtered_df['within_box'] = filtered_df.apply(lambda row: row['pred_x1'] <= row['actual_x'] <= row['pred_x2'] and row['pred_y1'] <= row['actual_y'] <= row['pred_y2'], axis=1)
-    TP = filtered_df.loc[filtered_df['within_box'] == True].shape[0]
-    FP = filtered_df.loc[filtered_df['within_box'] == False].shape[0]
+    has_prediction = prediction_index >= 0
+    x, y = df['actual_x'].to_numpy(), df['actual_y'].to_numpy()
+    within_box = has_prediction & (df['pred_x1'].to_numpy() <= x) & (x <= df['pred_x2'].to_numpy()) \
+                                & (df['pred_y1'].to_numpy() <= y) & (y <= df['pred_y2'].to_numpy())
+    df['within_box'] = within_box
+
+    TP = int(within_box.sum())
+    FP = int((has_prediction & ~within_box).sum())
+    FN = int((~has_prediction).sum())
 
     print(f"TP: {TP}, FP: {FP}, FN: {FN}")
-    print(f"accuracy: {round((TP+FN)/(TP+FP+FN), 2)}, precision: {round(TP/(TP+FP), 2)}")
+    precision = round(TP/(TP+FP), 2) if TP+FP else 0.0 # no prediction matched any actual timestamp
+    print(f"accuracy: {round(TP/(TP+FP+FN), 2)}, precision: {precision}")
+
+    return df
+
+def match_timestamps(times, sorted_times, tolerance_ms=0):
+    '''
+    for each of times, returns the index of the nearest value in sorted_times (earlier one on ties),
+    or -1 if it is more than tolerance_ms away
+    '''
+    import numpy as np
+
+    if len(sorted_times) == 0:
+        return np.full(len(times), -1)
+    after = np.clip(np.searchsorted(sorted_times, times), 0, len(sorted_times) - 1)
+    before = np.clip(after - 1, 0, len(sorted_times) - 1)
+    nearest = np.where(np.abs(sorted_times[after] - times) < np.abs(times - sorted_times[before]), after, before)
+    return np.where(np.abs(sorted_times[nearest] - times) <= tolerance_ms, nearest, -1)
+
+def load_prediction_frame(prediction_path:str):
+    '''
+    loads saved detections into a dataframe with columns
+    pred_timestamp, class_label, confidence, pred_x1, pred_y1, pred_x2, pred_y2
+    '''
+    import pandas as pd
+    from cursor_tracker.detection_io import detections_to_array, iter_detections, load_class_names, load_detections
+
+    if prediction_path.endswith('.npy'):
+        array, class_names = load_detections(prediction_path), load_class_names(prediction_path)
+    else:
+        array, class_names = detections_to_array(iter_detections(prediction_path))
 
-    return df
\ No newline at end of file
+    bbox = array['bbox']
+    return pd.DataFrame({
+        'pred_timestamp': array['timestamp'],
+        'class_label': pd.Series(array['class_id']).map(class_names),
+        'confidence': array['confidence'],
+        'pred_x1': bbox[:, 0], 'pred_y1': bbox[:, 1], 'pred_x2': bbox[:, 2], 'pred_y2': bbox[:, 3]
+    })
@@ -3,15 +3,29 @@
 def get_time_coord_raw(json_path:str):
     '''
     take in json_path:str and outputs time_coord_raw: List[Tuple[Int, Tuple[Int, Int]]] 
+    json_path can be a .json list or a streamed .jsonl file from generate_results, which is read lazily,
+    or a columnar .npy file (see get_time_coord_arrays)
     '''
-    import pandas as pd
-    import json
-    # read the json file
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-    # convert the json data to a dataframe
-    df = pd.read_json(json.dumps(data))
-    return list(zip(df['timestamp'], df['coordinates']))
+    if json_path.endswith('.npy'):
+        timestamps, coordinates = get_time_coord_arrays(json_path)
+        return list(zip(timestamps.tolist(), map(tuple, coordinates.astype('float64').round(2).tolist())))
+
+    from cursor_tracker.detection_io import iter_detections
+    return [(detection['timestamp'], tuple(detection['coordinates'])) for detection in iter_detections(json_path)]
+
+def get_time_coord_arrays(path:str):
+    '''
+    take in path to saved detections and outputs (timestamps, coordinates) as numpy arrays of shape (N,) and (N, 2)
+    for a columnar .npy file the arrays are memory-mapped columns, so nothing is parsed
+    '''
+    import numpy as np
+    from cursor_tracker.detection_io import load_detections
+    if path.endswith('.npy'):
+        detections = load_detections(path)
+        return detections['timestamp'], detections['coordinates']
+    time_coord_raw = get_time_coord_raw(path)
+    return np.array([t for t, _ in time_coord_raw], dtype='int64').reshape(-1), \
+           np.array([c for _, c in time_coord_raw], dtype='float64').reshape(-1, 2)
 
 def post_process_data(time_coord_raw, height, split = False, threshold=None): # can set default to threshold=2*FPS
     ''' 
@@ -24,7 +38,19 @@ def post_process_data(time_coord_raw, height, split = False, threshold=None): #
         - threshold should be minimally more than FPS
 
     returns a List[List[Tuple[Int, Tuple[Int, Int]]] 
+
+    time_coord_raw can also be a trajectory.Trajectory, which is sorted and flipped in place,
+    and whose sections are Trajectories sharing its memory
     '''
+    from cursor_tracker.trajectory import Trajectory
+    if isinstance(time_coord_raw, Trajectory):
+        time_coord_raw.sort().flip_height(height)
+        if not split:
+            return time_coord_raw
+        sections = time_coord_raw.split(threshold)
+        print(f"all_data split into {len(sections)} sections, each of {tuple(map(len, sections))} length")
+        return sections
+
     time_coord_raw.sort(key=lambda tup: tup[0]) # sort by timestamp
     time_coord_raw = list(map(lambda x: (x[0], (round(x[1][0], 2), round(height - x[1][1],2))), time_coord_raw)) # adjust height
 
@@ -52,25 +78,40 @@ def post_process_data(time_coord_raw, height, split = False, threshold=None): #
 
 def group_coordinates(all_data, height, width, factor):
     ''' takes in all_data 
-        and returns new_all_data, x and y as three separate lists '''
+        and returns new_all_data, x and y as three separate lists 
+        if all_data is a trajectory.Trajectory, new_all_data is a grouped copy of it '''
+    from cursor_tracker.trajectory import Trajectory
+    if isinstance(all_data, Trajectory):
+        return all_data.copy().group(factor), height/factor, width/factor
     return list(map(lambda tup: (tup[0], (tup[1][0]//factor, tup[1][1]//factor)), all_data)), height/factor, width/factor
 
-def get_one_frame(video_path:str, time_ms:int, width = 1920, height = 1280):
-    '''Show one frame of the video at time_ms'''
+def get_time_x_y(time_coord_data):
+    ''' returns timestamps, x_values and y_values of time_coord_data, as array views for a trajectory.Trajectory '''
+    from cursor_tracker.trajectory import Trajectory
+    if isinstance(time_coord_data, Trajectory):
+        return time_coord_data.times, time_coord_data.x, time_coord_data.y
+    return list(map(lambda x: x[0], time_coord_data)), \
+           list(map(lambda x: x[1][0], time_coord_data)), \
+           list(map(lambda x: x[1][1], time_coord_data))
+
+def get_one_frame(video_path:str, time_ms:int, width = 1920, height = 1280, frames=None):
+    '''Show one frame of the video at time_ms
+    frames: optional frames.FrameExtractor of video_path, shared across calls to avoid reopening the video'''
     import cv2
     import matplotlib.pyplot as plt
-    cap = cv2.VideoCapture(video_path)
-    cap.set(cv2.CAP_PROP_POS_MSEC, time_ms)
-    _, frame = cap.read()
-    frame = cv2.resize(frame, (width,height))
+    if frames is not None:
+        frame = frames.frame(time_ms)
+    else:
+        cap = cv2.VideoCapture(video_path)
+        cap.set(cv2.CAP_PROP_POS_MSEC, time_ms)
+        _, frame = cap.read()
+        frame = cv2.resize(frame, (width,height))
     plt.imshow(frame[:,:,::-1])
 
 def plot_2D(time_coord_data, x_lim=None, y_lim=None,):
     ''' Visualise 2D trajectory as plot '''
     import matplotlib.pyplot as plt
-    _, x_values, y_values = list(map(lambda x: x[0], time_coord_data)), \
-           list(map(lambda x: x[1][0], time_coord_data)), \
-           list(map(lambda x: x[1][1], time_coord_data))
+    _, x_values, y_values = get_time_x_y(time_coord_data)
     plt.scatter(x_values, y_values, color='blue', marker='o', alpha = 0.5)
     # Set axis labels and plot title
     plt.xlabel('X position')
@@ -86,9 +127,7 @@ def plot_3D(time_coord_data, x_lim=None, time_lim=None, z_lim=None):
 
     ''' plot 3D plot to show position over time'''
     import matplotlib.pyplot as plt
-    timestamps, x_values, y_values = list(map(lambda x: x[0], time_coord_data)), \
-           list(map(lambda x: x[1][0], time_coord_data)), \
-           list(map(lambda x: x[1][1], time_coord_data))
+    timestamps, x_values, y_values = get_time_x_y(time_coord_data)
     ax = plt.figure().add_subplot(projection='3d')
 
     ax.scatter(x_values, timestamps, y_values, label='Position of cursor over time')
@@ -104,14 +143,16 @@ def plot_3D(time_coord_data, x_lim=None, time_lim=None, z_lim=None):
 
     plt.show()
 
-def plot_3D_animation(time_coord_data, height, width, path):
-    ''' Creates 3D plot with animation and SAVES to gif format '''
+def plot_3D_animation(time_coord_data, height, width, path, max_frames=None):
+    ''' Creates 3D plot with animation and SAVES to gif format 
+    if max_frames is set, renders with render_3D_animation instead, which is much faster on long trajectories '''
+    if max_frames is not None:
+        return render_3D_animation(time_coord_data, height, width, path, max_frames)
+
     from matplotlib import pyplot as plt
     import numpy as np
     from matplotlib import animation
-    timestamps, x_values, y_values = list(map(lambda x: x[0], time_coord_data)), \
-           list(map(lambda x: x[1][0], time_coord_data)), \
-           list(map(lambda x: x[1][1], time_coord_data))
+    timestamps, x_values, y_values = get_time_x_y(time_coord_data)
 
     fig = plt.figure()
     ax = fig.add_subplot(projection='3d')
@@ -141,4 +182,64 @@ def plot_3D_animation(time_coord_data, height, width, path):
 
     ani = animation.FuncAnimation(fig, update, N, fargs=(data, line), interval=10000/N, blit=False)
     ani.save(path)
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+def render_3D_animation(time_coord_data, height, width, path, max_frames=300, duration_s=10, dpi=100):
+    '''
+    Renders the animation of plot_3D_animation to path, quickly and in bounded memory, for long trajectories
+    - draws at most max_frames frames, each adding the points since the previous one, over duration_s seconds
+    - the axes are drawn once, and each frame only draws the new part of the trajectory on top of the previous frame
+    - frames are streamed to the file as they are drawn: with cv2.VideoWriter for videos (e.g. .mp4), 
+      or with Pillow for .gif, which keeps each frame at one byte per pixel until the file is written
+
+    Returns: number of frames written
+    '''
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    timestamps, x_values, y_values = (np.asarray(values) for values in get_time_x_y(time_coord_data))
+
+    fig = Figure(dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(projection='3d')
+    # animated, so that it is left out when the axes are drawn, and drawn by itself for each frame
+    line, = ax.plot(x_values[:1], timestamps[:1], y_values[:1], animated=True)
+
+    # Setting the axes properties
+    ax.set_xlim3d([0, width])
+    ax.set_xlabel('X Position')
+
+    ax.set_ylim3d([0, timestamps[-1]])
+    ax.set_ylabel('Time (ms)')
+
+    ax.set_zlim3d([0, height])
+    ax.set_zlabel('Y Position')
+    canvas.draw()
+
+    N = len(x_values)
+    ends = np.unique(np.linspace(1, N, min(max_frames, N)).round().astype(int))
+
+    def frames():
+        start = 0
+        for end in ends:
+            # the new points, joined to the last point already drawn
+            new = slice(max(start - 1, 0), end)
+            line.set_data_3d(x_values[new], timestamps[new], y_values[new])
+            ax.draw_artist(line)
+            yield np.array(canvas.buffer_rgba())[:, :, :3]
+            start = end
+
+    fps = len(ends) / duration_s
+    if path.endswith('.gif'):
+        from PIL import Image
+        images = (Image.fromarray(frame).quantize(method=Image.Quantize.FASTOCTREE) for frame in frames())
+        first = next(images)
+        first.save(path, save_all=True, append_images=images, duration=1000 / fps, loop=0)
+    else:
+        import cv2
+        frame_height, frame_width = canvas.get_width_height()[::-1]
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame_width, frame_height))
+        for frame in frames():
+            out.write(frame[:, :, ::-1])
+        out.release()
+    return len(ends)
@@ -0,0 +1,125 @@
+# On-disk cache of motion analysis results, keyed by the contents of the detection file and the parameters
+
+import hashlib
+import json
+import os
+import pickle
+
+# bump when analyse_motion changes what it finds, so results cached by older code are not reused
+CACHE_VERSION = 1
+
+class AnalysisCache:
+    '''
+    Content-addressed cache of get_all_info outputs in cache_dir
+
+    Each result is stored under a hash of the detection file's contents and of the analysis parameters,
+    so editing or regenerating a detection file changes its key, and stale results are never returned.
+    Entries are evicted least recently used first once their total size exceeds max_bytes.
+    Hashes of detection files are remembered by path, size and modification time, so an unchanged file
+    is not read again to look up its results.
+    '''
+    def __init__(self, cache_dir='results/cache', max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._digests_path = os.path.join(cache_dir, 'digests.json')
+
+    def file_digest(self, path:str):
+        ''' returns the sha256 of the contents of path, reading it only if it changed since it was last hashed '''
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        digests = self._read_digests()
+        key = os.path.abspath(path)
+        if key in digests and digests[key][:2] == signature:
+            return digests[key][2]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        digests[key] = signature + [sha.hexdigest()]
+        self._write_atomic(self._digests_path, json.dumps(digests).encode())
+        return sha.hexdigest()
+
+    def key(self, path:str, **params):
+        ''' returns the cache key of the detection file at path analysed with params '''
+        params = json.dumps({'version': CACHE_VERSION, **params}, sort_keys=True)
+        return hashlib.sha256(f"{self.file_digest(path)}:{params}".encode()).hexdigest()
+
+    def get(self, key:str):
+        ''' returns the cached result of key, or None '''
+        entry = self._entry_path(key)
+        try:
+            with open(entry, 'rb') as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(entry) # mark as recently used
+        return result
+
+    def put(self, key:str, result):
+        ''' stores result under key, then evicts the least recently used entries beyond max_bytes '''
+        self._write_atomic(self._entry_path(key), pickle.dumps(result))
+        self.evict()
+
+    def evict(self):
+        ''' deletes least recently used entries until the total size is within max_bytes '''
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def clear(self):
+        ''' deletes every cached result and remembered file hash '''
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl') or name == 'digests.json':
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def analyse_file(self, path:str, factor, height=1280, split=False, threshold=None, loop_duration=500,
+                     stationary_duration=3000, underline_duration=2000, max_loop_duration=10000):
+        '''
+        get_time_coord_raw(path) -> post_process_data(..., height, split, threshold) -> analyse_motion(..., factor, ...),
+        returning the cached all_info if this file was already analysed with the same parameters
+        if split is True, returns a list with the all_info of each section
+        '''
+        params = {'factor': factor, 'height': height, 'split': split, 'threshold': threshold,
+                  'loop_duration': loop_duration, 'stationary_duration': stationary_duration,
+                  'underline_duration': underline_duration, 'max_loop_duration': max_loop_duration}
+        key = self.key(path, **params)
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        from cursor_tracker.visualise_results import get_time_coord_raw, post_process_data
+        from motion_analysis.helper import analyse_motion
+        time_coord_data = post_process_data(get_time_coord_raw(path), height, split, threshold)
+        sections = time_coord_data if split else [time_coord_data]
+        all_info = [analyse_motion(section, factor, loop_duration, stationary_duration, underline_duration,
+                                   max_loop_duration) for section in sections]
+        result = all_info if split else all_info[0]
+        self.put(key, result)
+        return result
+
+    def _entry_path(self, key:str):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _read_digests(self):
+        try:
+            with open(self._digests_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_atomic(self, path:str, data:bytes):
+        # write then rename, so a reader never sees a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
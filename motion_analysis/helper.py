@@ -1,84 +1,246 @@
 # define helper functions for motion_analysis purposes
 
-def analyse_motion(time_coord_data, factor, loop_duration=500, stationary_duration=3000, underline_duration=2000):
+def analyse_motion(time_coord_data, factor, loop_duration=500, stationary_duration=3000, underline_duration=2000, max_loop_duration=10000, timer=None):
     '''
     Parameters: 
-    time_coord_data: list of tuples of (time, (x, y)) coordinates
+    time_coord_data: list of tuples of (time, (x, y)) coordinates, or a cursor_tracker.trajectory.Trajectory
     factor: factor to round the coordinates to
     loop_duration: minimum duration for a loop to be considered (default 0.5s)
     stationary_duration: minimum duration for a stationary point to be considered (default 3s)
     underline_duration: minimum duration for an underline to be considered (default 2s)
+    max_loop_duration: ignores loops longer than max_loop_duration ms (default 10s), bounding the work per point (see detect_loops).
+                       None finds loops of any length, at a cost quadratic in the time the cursor spends in one place
+    timer: a cursor_tracker.profiling.StageTimer to record the time spent in each detector 
+           (loops, stationary, underlines, collate) and counters of points, loop_starts, windows_evaluated, 
+           orientation_calls and events of each type. timer.report() gives them as a dictionary
 
     Returns: all_info with time_coord_data (list of dictionaries with information about loops, stationary points, and underlines)
     '''
+    from cursor_tracker.profiling import StageTimer
+    if timer is None:
+        timer = StageTimer(enabled=False)
 
-    # loop variables
-    window = []
-    loop = []
-    indx = 0
+    times, points = to_arrays(time_coord_data)
+    timer.count('points', len(times))
 
-    # stationary variables
-    stationary = []
+    # ----- check for loops ----- #
+    with timer.stage('loops'):
+        loop = detect_loops(times, points, factor, loop_duration, max_loop_duration, timer=timer)
 
-    # underline variables
-    underline = []
+    # ----- check for stationary points ----- #
+    with timer.stage('stationary'):
+        stationary = detect_stationary(times, points, factor, stationary_duration)
 
-    previous_coords = None
+    # ----- check for underline (horizontal) points ----- #
+    with timer.stage('underlines'):
+        underline = detect_underlines(times, points, factor, underline_duration)
 
-    for time, coord in time_coord_data:
-        
-        # ----- check for loops ----- #
-        #print("Start of new sliding window / loop")
-        window.append(time_coord_data[indx])
-        for time_inner, coord_inner in time_coord_data[indx+1:]:
-            window.append((time_inner, coord_inner))
-            if window[-1][0] - window[0][0] > loop_duration: # default minimum 0.5s for anything meaningful
-                if is_clockwise_or_counterclockwise(list(map(lambda x: x[1], window))) and \
-                    (round_to_factor(window[-1][1][0], factor) == round_to_factor(window[0][1][0], factor)) and \
-                    (round_to_factor(window[-1][1][1], factor) == round_to_factor(window[0][1][1], factor)):  # checks if loop is closed
-                    
-                    if loop and loop[-1][0] <= window[0][0] <= loop[-1][1]:
-                        # compare end window timing with end timing of latest loop
-                        if window[-1][0] > loop[-1][1]: 
-                            loop[-1][1] = window[-1][0]
-                    else:
-                        loop.append([window[0][0], window[-1][0], 'loop']) # adds the start and end time of the loop
-        window.clear()
-        indx += 1
-
-        # ----- check for stationary points ----- #
-        coord_factored =  (round_to_factor(coord[0], factor), round_to_factor(coord[1],factor))
-        if previous_coords is None:
-            current_stationary = [time, time] # start time, end time
-        elif coord_factored == previous_coords:
-            current_stationary[1] = time # modify and set end time
-        else:
-            # default minimum 3s to indicate stationary
-            if current_stationary[1] - current_stationary[0] > stationary_duration:
-                stationary.append(current_stationary+['stationary'])
-            # start new check
-            current_stationary = [time, time] 
-        
+    all_info = loop + stationary + underline
+    timer.count('events_loop', len(loop))
+    timer.count('events_stationary', len(stationary))
+    timer.count('events_underline', len(underline))
+
+    with timer.stage('collate'):
+        return get_all_info(all_info, time_coord_data)
+
+
+def to_arrays(time_coord_data):
+    '''
+    converts time_coord_data: list of tuples of (time, (x, y)) into 
+    times: array of shape (N,) and points: float array of shape (N, 2)
+    a cursor_tracker.trajectory.Trajectory returns its own arrays, without copying
+    '''
+    import numpy as np
+    from cursor_tracker.trajectory import Trajectory
+    if isinstance(time_coord_data, Trajectory):
+        return time_coord_data.times, time_coord_data.points
+    times = np.array([t for t, _ in time_coord_data]).reshape(-1)
+    points = np.array([c for _, c in time_coord_data], dtype=np.float64).reshape(-1, 2)
+    return times, points
+
+def quantise(points, factor):
+    ''' vectorised round_to_factor of an array of coordinates '''
+    return ((points + factor // 2) // factor) * factor
+
+def detect_loops(times, points, factor, loop_duration=500, max_loop_duration=10000, timer=None):
+    '''
+    Finds closed clockwise or counterclockwise loops in the trajectory of times and points (see to_arrays)
+
+    A window of points from index i to j is a loop if it lasts more than loop_duration, 
+    is_clockwise_or_counterclockwise holds for its points, and its first and last points round to the same 
+    coordinates with round_to_factor. Loops starting within the previous loop are merged into it.
+
+    Rather than re-evaluating every window point by point, orientations of consecutive points are computed once 
+    and summed with prefix sums, so each window is checked in constant time, and only windows whose end point 
+    rounds to the same coordinates as their start point are considered.
+    windows longer than max_loop_duration ms are skipped (times must be sorted), bounding the work per point for long recordings.
+    With max_loop_duration None every later point in the same rounded cell is checked, so a cursor parked for n points
+    costs O(n^2), e.g. about a minute for an hour of a still cursor at 10 frames/s, against seconds with the default.
+    timer: optional cursor_tracker.profiling.StageTimer, see loop_candidates
+
+    Returns: list of [start_time, end_time, 'loop']
+    '''
+    return merge_loops(loop_candidates(times, points, factor, loop_duration, max_loop_duration, timer=timer))
 
-        # ----- check for underline (horizontal) points ----- #
-        if previous_coords is None:
-            current_underline = [time, time, coord, coord] # start time, end time, start position(unfactored), end position(unfactored)
-        elif coord_factored[1] == previous_coords[1] and coord_factored[0] != previous_coords[0]: # check same y value AND different x value
-            current_underline[1] = time # modify and set end time
-            current_underline[3] = coord # modify and set end coord
+def loop_candidates(times, points, factor, loop_duration=500, max_loop_duration=10000, start=0, stop=None, prefix=None,
+                    timer=None):
+    '''
+    For each start index i in [start, stop) (default: every point), finds the windows i..j that are loops (see detect_loops)
+    Only points from start onwards are used, so a trajectory can be split by start index as long as 
+    each part keeps every point after its starts (or max_loop_duration ms after them)
+    prefix: orientation_prefix(points), if already computed (it does not depend on factor)
+    timer: optional cursor_tracker.profiling.StageTimer, counting loop_starts, windows_evaluated 
+           (windows whose orientations are summed) and orientation_calls (orientations of three points computed)
+
+    Returns: list of (start_time, end_time) for each start index that begins at least one loop, 
+    in order of index, with end_time the latest end of its loops
+    '''
+    import numpy as np
+
+    n = len(times)
+    stop = n if stop is None else stop
+    if n < 5:
+        return []
+
+    orientation_calls = 0
+    if prefix is None:
+        prefix = orientation_prefix(points)
+        orientation_calls += n - 2
+
+    # group point indices by rounded coordinates, in order of index within each group
+    _, cell_ids = np.unique(quantise(points, factor), axis=0, return_inverse=True)
+    cell_ids = cell_ids.reshape(-1)
+    order = np.argsort(cell_ids, kind='stable')
+    rank_of = np.empty(n, dtype=np.int64)
+    rank_of[order] = np.arange(n)
+    group_ends = np.searchsorted(cell_ids[order], cell_ids[order], side='right')
+    group_times = times[order]
+
+    candidates = []
+    windows_evaluated = 0
+    for i in range(start, stop):
+        # candidate ends j > i in the same cell
+        rank = rank_of[i]
+        group_stop = group_ends[rank]
+        if max_loop_duration is not None:
+            group_stop = rank + 1 + np.searchsorted(group_times[rank + 1:group_stop], times[i] + max_loop_duration, side='right')
+        ends = order[rank + 1:group_stop]
+        # at least 5 points, lasting more than loop_duration
+        ends = ends[(ends >= i + 4) & (times[ends] - times[i] > loop_duration)]
+        if len(ends) == 0:
+            continue
+
+        windows_evaluated += len(ends)
+        ends = loop_ends(points, prefix, i, ends)
+        if len(ends) == 0:
+            continue
+        candidates.append((times[i].item(), times[ends].max().item()))
+
+    if timer is not None:
+        # counted once here rather than per start, to keep the loop cheap
+        timer.count('loop_starts', max(stop - start, 0))
+        timer.count('windows_evaluated', windows_evaluated)
+        timer.count('orientation_calls', orientation_calls + 2 * windows_evaluated)
+    return candidates
+
+def orientation_prefix(points):
+    ''' prefix sums of the orientations of every three consecutive points, starting with 0 '''
+    import numpy as np
+    orientations = orientations_of(points[:-2], points[1:-1], points[2:])
+    return np.concatenate(([0], np.cumsum(orientations)))
+
+def merge_loops(candidates):
+    '''
+    takes in (start_time, end_time) loop candidates in order of start index (see loop_candidates), 
+    merges those starting within the previous loop into it
+    Returns: list of [start_time, end_time, 'loop']
+    '''
+    loop = []
+    for start_time, end_time in candidates:
+        if loop and loop[-1][0] <= start_time <= loop[-1][1]:
+            # compare end window timing with end timing of latest loop
+            if end_time > loop[-1][1]:
+                loop[-1][1] = end_time
         else:
-            # default minimum 2s to indicate underline OR consider: min distance for underline
-            if current_underline[1] - current_underline[0] >= underline_duration: 
-                underline.append([current_underline[0], current_underline[1], 'underline'])
-            # start new check
-            current_underline = [time, time, coord, coord]
-        
-        previous_coords = coord_factored
+            loop.append([start_time, end_time, 'loop']) # adds the start and end time of the loop
+    return loop
 
-    all_info = loop + stationary + underline
+def loop_ends(points, prefix, i, ends):
+    '''
+    filters candidate end indices ends of windows starting at index i, 
+    keeping those for which is_clockwise_or_counterclockwise holds for points[i:j+1]
 
-    return get_all_info(all_info, time_coord_data)
+    prefix: prefix sums of the orientations of consecutive triples of points, starting with 0
+    '''
+    import numpy as np
+    # orientation sum of the closed polygon i..j: consecutive triples within the window, 
+    # plus the two triples that wrap around from j back to i
+    window_sum = prefix[ends - 1] - prefix[i] \
+        + orientations_of(points[ends - 1], points[ends], points[i]) \
+        + orientations_of(points[ends], points[i], points[i + 1])
+    sizes = ends - i + 1
+    return ends[(0.8 * sizes).astype(int) <= np.abs(window_sum)]
 
+def detect_stationary(times, points, factor, stationary_duration=3000):
+    '''
+    Finds runs of consecutive points that round to the same coordinates with round_to_factor
+    and last more than stationary_duration. The run still open at the last point is not reported.
+
+    Returns: list of [start_time, end_time, 'stationary']
+    '''
+    start_times, end_times = stationary_runs(times, quantise(points, factor))
+    keep = end_times - start_times > stationary_duration
+    return [[start, end, 'stationary'] for start, end in zip(start_times[keep].tolist(), end_times[keep].tolist())]
+
+def detect_underlines(times, points, factor, underline_duration=2000):
+    '''
+    Finds runs of consecutive points where each point rounds to the same y and a different x as the one before,
+    lasting at least underline_duration. The run still open at the last point is not reported.
+
+    Returns: list of [start_time, end_time, 'underline']
+    '''
+    start_times, end_times = underline_runs(times, quantise(points, factor))
+    keep = end_times - start_times >= underline_duration
+    return [[start, end, 'underline'] for start, end in zip(start_times[keep].tolist(), end_times[keep].tolist())]
+
+def stationary_runs(times, rounded):
+    '''
+    rounded: quantise(points, factor)
+    Returns: (start_times, end_times) of every closed run of points rounding to the same coordinates, of any duration
+    '''
+    import numpy as np
+    # a new run starts wherever the rounded position changes
+    breaks = np.any(rounded[1:] != rounded[:-1], axis=1)
+    starts, ends = closed_runs(breaks)
+    return times[starts], times[ends]
+
+def underline_runs(times, rounded):
+    '''
+    rounded: quantise(points, factor)
+    Returns: (start_times, end_times) of every closed horizontal run (see detect_underlines), of any duration
+    '''
+    # a new run starts wherever y changes or x stays the same
+    breaks = (rounded[1:, 1] != rounded[:-1, 1]) | (rounded[1:, 0] == rounded[:-1, 0])
+    starts, ends = closed_runs(breaks)
+    return times[starts], times[ends]
+
+def closed_runs(breaks):
+    '''
+    breaks: boolean array of length N-1, True where point k+1 starts a new run
+    Returns: (starts, ends) index arrays of every run that is followed by another run
+    '''
+    import numpy as np
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    return starts[:-1], starts[1:] - 1
+
+def orientations_of(p, q, r):
+    '''
+    vectorised orientation: p, q and r are arrays of shape (N, 2), or a single point of shape (2,)
+    Returns: array of 0 if collinear, 1 if clockwise, -1 if counterclockwise
+    '''
+    import numpy as np
+    val = (q[..., 1] - p[..., 1]) * (r[..., 0] - q[..., 0]) - (q[..., 0] - p[..., 0]) * (r[..., 1] - q[..., 1])
+    return np.sign(val).astype(np.int64)
 
 def round_to_factor(number, factor):
     '''
@@ -123,9 +285,10 @@ def is_clockwise_or_counterclockwise(polygon):
 # --- functions for collating analysis results --- #
 
 def get_all_info(all_info, time_coord_data):
+    index = as_index(time_coord_data) # sort once, then every event is a binary search
     all_info_dct = [] # key value pairs of start_time: info
     for info in all_info:
-        all_info_dct.append(get_info(info[0], info[1], info[2], time_coord_data))
+        all_info_dct.append(get_info(info[0], info[1], info[2], index))
     return all_info_dct
 
 def get_info(start_time, end_time, type, time_coord_data):
@@ -136,7 +299,7 @@ def get_info(start_time, end_time, type, time_coord_data):
     start_time: start time of the motion type 
     end_time: end time of the motion type
     type: type of motion ("loop", "stationary", "underline")
-    time_coord_data: list of tuples of (time, (x, y)) coordinates for the entire duration
+    time_coord_data: list of tuples of (time, (x, y)) coordinates for the entire duration, or a TrajectoryIndex of it
 
     Note that start_time and end_time must be within the range of times in time_coord_data 
 
@@ -146,7 +309,7 @@ def get_info(start_time, end_time, type, time_coord_data):
     info['start_time'] = start_time
     info['end_time'] = end_time
     info['type'] = type
-    coord_data = list(map(lambda x: x[1], filter(lambda tup: tup[0] >= start_time and tup[0] <= end_time, time_coord_data)))
+    coord_data = as_index(time_coord_data).coords(start_time, end_time)
 
     if type == 'loop':
         info['start_pos'] = coord_data[0]
@@ -181,4 +344,46 @@ def get_bounding_box(points):
         'max_y': max_y
     }
 
-    return bounding_box
\ No newline at end of file
+    return bounding_box
+
+class TrajectoryIndex:
+    '''
+    Index over time_coord_data sorted by time, for range queries by binary search
+
+    Build it once with TrajectoryIndex(time_coord_data) and pass it wherever time_coord_data is accepted 
+    by get_info, get_all_info and the functions of visualise_result_series, 
+    so each [start_time, end_time] lookup costs O(log n) instead of a scan of every point
+    '''
+    def __init__(self, time_coord_data):
+        time_coord_data = list(time_coord_data)
+        if any(time_coord_data[i][0] > time_coord_data[i+1][0] for i in range(len(time_coord_data) - 1)):
+            time_coord_data.sort(key=lambda tup: tup[0]) # stable, so points with equal times keep their order
+        self.time_coord_data = time_coord_data
+        self.times = [tup[0] for tup in time_coord_data]
+
+    def __len__(self):
+        return len(self.time_coord_data)
+
+    def __iter__(self):
+        return iter(self.time_coord_data)
+
+    def range(self, start_time, end_time):
+        ''' returns the (time, (x, y)) tuples with start_time <= time <= end_time '''
+        from bisect import bisect_left, bisect_right
+        return self.time_coord_data[bisect_left(self.times, start_time):bisect_right(self.times, end_time)]
+
+    def coords(self, start_time, end_time):
+        ''' returns the (x, y) coordinates with start_time <= time <= end_time '''
+        return [coord for _, coord in self.range(start_time, end_time)]
+
+def as_index(time_coord_data):
+    '''
+    returns time_coord_data if it is already a TrajectoryIndex, otherwise builds one
+    a cursor_tracker.trajectory.Trajectory answers the same queries itself, once sorted
+    '''
+    from cursor_tracker.trajectory import Trajectory
+    if isinstance(time_coord_data, TrajectoryIndex):
+        return time_coord_data
+    if isinstance(time_coord_data, Trajectory):
+        return time_coord_data if time_coord_data.is_sorted() else time_coord_data.copy().sort()
+    return TrajectoryIndex(time_coord_data)
@@ -0,0 +1,169 @@
+# Incremental motion analysis, for detections fed one at a time while a recording is processed
+
+from motion_analysis.helper import get_info, loop_ends, orientation_prefix, round_to_factor
+
+class OnlineMotionAnalyser:
+    '''
+    Detects loops, stationary points and underlines as points arrive, with the same rules as analyse_motion,
+    and emits each event as a get_info dictionary as soon as it can no longer change
+
+    factor, loop_duration, stationary_duration, underline_duration: as in analyse_motion
+    max_loop_duration: longest loop window considered, as in analyse_motion. Required, as it bounds how long
+                       points are kept: only the last max_loop_duration ms of points (or back to the start of an
+                       unfinished loop) are held in memory. Stationary points and underlines keep running totals only
+    height: if set, detections fed through feed_detections are flipped like post_process_data(time_coord_raw, height)
+    on_event: optional function called with each event dictionary when it is emitted
+
+    Points must be fed in order of time. Events are also collected in self.events.
+    With strictly increasing times, the events emitted by the end of close() are those of
+    analyse_motion(time_coord_data, factor, ..., max_loop_duration=max_loop_duration), in order of completion
+    '''
+    def __init__(self, factor, loop_duration=500, stationary_duration=3000, underline_duration=2000,
+                 max_loop_duration=10000, height=None, on_event=None):
+        self.factor = factor
+        self.loop_duration = loop_duration
+        self.stationary_duration = stationary_duration
+        self.underline_duration = underline_duration
+        self.max_loop_duration = max_loop_duration
+        self.height = height
+        self.on_event = on_event
+        self.events = []
+
+        # recent points, self.points[k] has index self.base + k since the first point
+        self.points = []
+        self.base = 0
+        self.next_start = 0    # index of the next loop start to evaluate
+        self.open_loop = None  # [start_time, end_time, start_index] of the latest loop, while it can still be extended
+
+        self.previous_cell = None
+        self.stationary = None # [start_time, end_time, sum_x, sum_y, count]
+        self.underline = None  # [start_time, end_time, start_pos, end_pos, min_x, max_x]
+
+    def feed(self, time, coord):
+        '''
+        adds one point of the trajectory
+        Returns: list of events completed by this point
+        '''
+        emitted = len(self.events)
+        cell = (round_to_factor(coord[0], self.factor), round_to_factor(coord[1], self.factor))
+        self._update_stationary(time, coord, cell)
+        self._update_underline(time, coord, cell)
+        self.previous_cell = cell
+
+        self.points.append((time, coord))
+        # loops starting more than max_loop_duration ago cannot gain any more end points
+        while self.next_start < self.base + len(self.points) and \
+                time - self.points[self.next_start - self.base][0] > self.max_loop_duration:
+            self._evaluate_start(self.next_start)
+            self.next_start += 1
+        self._trim()
+        return self.events[emitted:]
+
+    def feed_detections(self, detections):
+        '''
+        adds the best detection of a list of detection dictionaries from cursor_tracker.run.generate_results,
+        e.g. generate_results(..., on_detections=analyser.feed_detections)
+        Returns: list of events completed by it
+        '''
+        if not detections:
+            return []
+        detection = max(detections, key=lambda d: d['confidence'])
+        x, y = detection['coordinates']
+        if self.height is not None:
+            x, y = round(x, 2), round(self.height - y, 2)
+        return self.feed(detection['timestamp'], (x, y))
+
+    def close(self):
+        '''
+        marks the end of the trajectory, evaluating the remaining loop starts
+        As in analyse_motion, stationary points and underlines still in progress are not reported
+        Returns: list of events completed
+        '''
+        emitted = len(self.events)
+        while self.next_start < self.base + len(self.points):
+            self._evaluate_start(self.next_start)
+            self.next_start += 1
+        if self.open_loop is not None:
+            self._emit_loop()
+        return self.events[emitted:]
+
+    # ----- loops ----- #
+    def _evaluate_start(self, i):
+        ''' finds the loops starting at point index i, given every point up to max_loop_duration after it '''
+        import numpy as np
+
+        start_time = self.points[i - self.base][0]
+        if self.open_loop is not None and start_time > self.open_loop[1]:
+            # no later start can fall within the open loop any more
+            self._emit_loop()
+
+        window = self.points[i - self.base:]
+        if len(window) < 5:
+            return
+        times = np.array([t for t, _ in window])
+        points = np.array([c for _, c in window], dtype=np.float64)
+        prefix = orientation_prefix(points)
+
+        ends = np.arange(4, len(window))
+        duration = times[ends] - times[0]
+        rounded = ((points + self.factor // 2) // self.factor) * self.factor
+        same_cell = np.all(rounded[ends] == rounded[0], axis=1)
+        ends = ends[same_cell & (duration > self.loop_duration) & (duration <= self.max_loop_duration)]
+        if len(ends) == 0:
+            return
+        ends = loop_ends(points, prefix, 0, ends)
+        if len(ends) == 0:
+            return
+
+        end_time = times[ends].max().item()
+        if self.open_loop is not None and self.open_loop[0] <= start_time <= self.open_loop[1]:
+            self.open_loop[1] = max(self.open_loop[1], end_time)
+        else:
+            if self.open_loop is not None:
+                self._emit_loop()
+            self.open_loop = [start_time, end_time, i]
+
+    def _emit_loop(self):
+        start_time, end_time, start_index = self.open_loop
+        self.open_loop = None
+        self._emit(get_info(start_time, end_time, 'loop', self.points[start_index - self.base:]))
+
+    def _trim(self):
+        ''' drops points that no loop start or open loop can still need '''
+        keep_from = self.next_start if self.open_loop is None else min(self.next_start, self.open_loop[2])
+        # drop in bulk so that trimming stays amortised O(1) per point
+        if keep_from - self.base > max(len(self.points) // 2, 64):
+            del self.points[:keep_from - self.base]
+            self.base = keep_from
+
+    # ----- stationary points and underlines ----- #
+    def _update_stationary(self, time, coord, cell):
+        if self.previous_cell is not None and cell == self.previous_cell:
+            self.stationary[1] = time
+            self.stationary[2] += coord[0]
+            self.stationary[3] += coord[1]
+            self.stationary[4] += 1
+            return
+        if self.stationary is not None and self.stationary[1] - self.stationary[0] > self.stationary_duration:
+            start_time, end_time, sum_x, sum_y, count = self.stationary
+            self._emit({'start_time': start_time, 'end_time': end_time, 'type': 'stationary',
+                        'pos': (sum_x//count, sum_y//count)})
+        self.stationary = [time, time, coord[0], coord[1], 1]
+
+    def _update_underline(self, time, coord, cell):
+        if self.previous_cell is not None and cell[1] == self.previous_cell[1] and cell[0] != self.previous_cell[0]:
+            self.underline[1] = time
+            self.underline[3] = coord
+            self.underline[4] = min(self.underline[4], coord[0])
+            self.underline[5] = max(self.underline[5], coord[0])
+            return
+        if self.underline is not None and self.underline[1] - self.underline[0] >= self.underline_duration:
+            start_time, end_time, start_pos, end_pos, min_x, max_x = self.underline
+            self._emit({'start_time': start_time, 'end_time': end_time, 'type': 'underline',
+                        'start_pos': start_pos, 'end_pos': end_pos, 'max_distance': round(max_x - min_x)})
+        self.underline = [time, time, coord, coord, coord[0], coord[0]]
+
+    def _emit(self, event):
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
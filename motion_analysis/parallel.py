@@ -0,0 +1,57 @@
+# Parallel motion analysis of trajectory sections across a process pool
+
+from concurrent.futures import ProcessPoolExecutor
+
+from motion_analysis.helper import analyse_motion, detect_stationary, detect_underlines, \
+    get_all_info, loop_candidates, merge_loops, to_arrays
+
+def analyse_sections(sections, factor, loop_duration=500, stationary_duration=3000, underline_duration=2000,
+                     max_loop_duration=10000, workers=None, chunk_points=5000):
+    '''
+    Runs analyse_motion on every section of post_process_data(..., split=True) across a pool of worker processes,
+    and returns the events of all sections in one list, section by section, as analyse_motion would list them
+
+    Parameters are those of analyse_motion, plus
+    workers: number of worker processes (default: number of CPUs)
+    chunk_points: sections longer than this are split further, so one long section does not occupy a single worker.
+                  Loop search, the expensive part, is split by start point: each chunk looks for loops starting
+                  in its points, using every later point of the section (or max_loop_duration ms of them),
+                  and the loops found are merged in order afterwards, so loops crossing a chunk edge are stitched
+                  exactly as analyse_motion would. Stationary points and underlines are linear run-length scans,
+                  and are found on the whole section.
+    '''
+    import numpy as np
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = []
+        for section in sections:
+            if len(section) <= chunk_points:
+                tasks.append(('section', section, pool.submit(analyse_motion, section, factor, loop_duration,
+                                                              stationary_duration, underline_duration, max_loop_duration)))
+                continue
+
+            times, points = to_arrays(section)
+            futures = []
+            for start in range(0, len(times), chunk_points):
+                stop = min(start + chunk_points, len(times))
+                # later points the loops starting in this chunk can end at
+                end = len(times) if max_loop_duration is None else \
+                    int(np.searchsorted(times, times[stop - 1] + max_loop_duration, side='right'))
+                futures.append(pool.submit(loop_candidates, times[start:end], points[start:end], factor,
+                                           loop_duration, max_loop_duration, 0, stop - start))
+            tasks.append(('chunks', section, (times, points, futures)))
+
+        all_info = []
+        for kind, section, task in tasks:
+            if kind == 'section':
+                all_info.extend(task.result())
+                continue
+            # stitch the chunks together in order of start point
+            times, points, futures = task
+            loop = merge_loops(candidate for future in futures for candidate in future.result())
+            stationary = detect_stationary(times, points, factor, stationary_duration)
+            underline = detect_underlines(times, points, factor, underline_duration)
+            all_info.extend(get_all_info(loop + stationary + underline, section))
+
+    print(f"{len(all_info)} events found in {len(sections)} sections")
+    return all_info
@@ -0,0 +1,126 @@
+# Spatial index of detected events across recordings, for region queries over a whole archive
+
+import json
+import math
+
+def get_event_box(info):
+    '''
+    takes in an event dictionary from get_info and returns the (min_x, min_y, max_x, max_y) it covers on screen:
+    the bounding box of a loop, the position of a stationary point, or the segment of an underline
+    '''
+    if info['type'] == 'loop':
+        bbox = info['bounding_box']
+        return bbox['min_x'], bbox['min_y'], bbox['max_x'], bbox['max_y']
+    if info['type'] == 'stationary':
+        x, y = info['pos']
+        return x, y, x, y
+    (x1, y1), (x2, y2) = info['start_pos'], info['end_pos']
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+class EventIndex:
+    '''
+    Uniform grid over the screen, mapping each cell of cell_size pixels to the events whose box (see get_event_box)
+    touches it, so a region query only looks at the events of the cells it covers instead of every event
+
+    Add the all_info of each recording with add(all_info, recording), query with query_rect or query_radius,
+    and save it next to the analysis results with save(path) / EventIndex.load(path)
+    '''
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.events = []     # (recording, info)
+        self.boxes = []      # get_event_box of each event
+        self.grid = {}       # (cell_x, cell_y): list of event ids
+        self._extent = None  # lowest and highest (cell_x, cell_y) holding events
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, all_info, recording=None):
+        ''' indexes the event dictionaries of all_info, labelled with recording (e.g. the video name) '''
+        for info in all_info:
+            event_id = len(self.events)
+            box = get_event_box(info)
+            self.events.append((recording, info))
+            self.boxes.append(box)
+            for cell in self._cells(*box):
+                self.grid.setdefault(cell, []).append(event_id)
+            low, high = (box[0] // self.cell_size, box[1] // self.cell_size), (box[2] // self.cell_size, box[3] // self.cell_size)
+            if self._extent is not None:
+                low = min(low[0], self._extent[0][0]), min(low[1], self._extent[0][1])
+                high = max(high[0], self._extent[1][0]), max(high[1], self._extent[1][1])
+            self._extent = low, high
+
+    def query_rect(self, min_x, min_y, max_x, max_y, types=None, time_range=None, recordings=None):
+        '''
+        returns (recording, info) of the events whose box intersects the rectangle, in order of addition
+
+        types: event types to keep, e.g. ('loop', 'underline') (default: all)
+        time_range: (start_time, end_time), keeps events overlapping it (default: any time)
+        recordings: recordings to keep (default: all)
+        '''
+        if not self.events:
+            return []
+        # only cells that hold events, so a query larger than the screen stays cheap
+        (low_x, low_y), (high_x, high_y) = self._extent
+        size = self.cell_size
+        found = set()
+        for cell in self._cells(max(min_x, low_x * size), max(min_y, low_y * size),
+                                min(max_x, (high_x + 1) * size - 1), min(max_y, (high_y + 1) * size - 1)):
+            for event_id in self.grid.get(cell, ()):
+                box = self.boxes[event_id]
+                if box[0] <= max_x and min_x <= box[2] and box[1] <= max_y and min_y <= box[3]:
+                    found.add(event_id)
+        return self._filter(sorted(found), types, time_range, recordings)
+
+    def query_radius(self, x, y, radius, types=None, time_range=None, recordings=None):
+        ''' returns (recording, info) of the events whose box is within radius of (x, y), filtered as in query_rect '''
+        found = []
+        for recording, info in self.query_rect(x - radius, y - radius, x + radius, y + radius, types, time_range, recordings):
+            min_x, min_y, max_x, max_y = get_event_box(info)
+            # distance from (x, y) to the closest point of the box
+            dx, dy = max(min_x - x, 0, x - max_x), max(min_y - y, 0, y - max_y)
+            if dx * dx + dy * dy <= radius * radius:
+                found.append((recording, info))
+        return found
+
+    def save(self, path:str):
+        ''' saves the indexed events as json; the grid is rebuilt on load '''
+        with open(path, 'w') as f:
+            json.dump({'cell_size': self.cell_size,
+                       'events': [{'recording': recording, **info} for recording, info in self.events]}, f)
+
+    @classmethod
+    def load(cls, path:str):
+        ''' loads an EventIndex saved with save(path) '''
+        with open(path) as f:
+            saved = json.load(f)
+        index = cls(saved['cell_size'])
+        for info in saved['events']:
+            recording = info.pop('recording')
+            # json turns the position tuples of get_info into lists
+            for key in ('start_pos', 'end_pos', 'pos', 'center'):
+                if key in info:
+                    info[key] = tuple(info[key])
+            index.add([info], recording)
+        return index
+
+    def _cells(self, min_x, min_y, max_x, max_y):
+        size = self.cell_size
+        for cell_x in range(math.floor(min_x / size), math.floor(max_x / size) + 1):
+            for cell_y in range(math.floor(min_y / size), math.floor(max_y / size) + 1):
+                yield cell_x, cell_y
+
+    def _filter(self, event_ids, types, time_range, recordings):
+        events = (self.events[event_id] for event_id in event_ids)
+        return [event for event in events if self._keep(event, types, time_range, recordings)]
+
+    @staticmethod
+    def _keep(event, types, time_range, recordings):
+        recording, info = event
+        if types is not None and info['type'] not in types:
+            return False
+        if recordings is not None and recording not in recordings:
+            return False
+        if time_range is not None and (info['end_time'] < time_range[0] or info['start_time'] > time_range[1]):
+            return False
+        return True
@@ -0,0 +1,66 @@
+# Parameter sweeps of analyse_motion thresholds, sharing the work between settings
+
+from itertools import product
+
+from motion_analysis.helper import loop_candidates, merge_loops, orientation_prefix, quantise, \
+    stationary_runs, to_arrays, underline_runs
+
+def sweep_parameters(time_coord_data, factors, loop_durations=(500,), stationary_durations=(3000,),
+                     underline_durations=(2000,), max_loop_duration=10000):
+    '''
+    Runs the detection of analyse_motion for every combination of factors, loop_durations, stationary_durations and
+    underline_durations, without repeating the work shared between them:
+    orientations of the trajectory are computed once, coordinates are quantised once per factor, loops and runs
+    are searched once per factor with no minimum duration, and each duration threshold is then a filter on them
+
+    time_coord_data: list of tuples of (time, (x, y)) coordinates
+    max_loop_duration: as in analyse_motion, the same for every setting
+
+    Returns: pandas DataFrame with one row per setting, with columns
+    factor, loop_duration, stationary_duration, underline_duration,
+    loops, stationary, underlines (number of each event), and
+    events: list of [start_time, end_time, type] as analyse_motion finds them, before get_all_info
+    '''
+    import numpy as np
+    import pandas as pd
+
+    times, points = to_arrays(time_coord_data)
+    prefix = orientation_prefix(points) if len(points) >= 3 else None
+
+    rows = []
+    for factor in factors:
+        rounded = quantise(points, factor)
+
+        # the latest end of the loops at a start grows with their duration, so a start with a loop lasting
+        # more than loop_duration always keeps the same end time, and lower thresholds only add starts
+        candidates = loop_candidates(times, points, factor, -np.inf, max_loop_duration, prefix=prefix)
+        loop = {}
+        for loop_duration in loop_durations:
+            loop[loop_duration] = merge_loops((start_time, end_time) for start_time, end_time in candidates
+                                              if end_time - start_time > loop_duration)
+
+        stationary = {}
+        start_times, end_times = stationary_runs(times, rounded)
+        for stationary_duration in stationary_durations:
+            keep = end_times - start_times > stationary_duration
+            stationary[stationary_duration] = [[start, end, 'stationary'] for start, end in
+                                               zip(start_times[keep].tolist(), end_times[keep].tolist())]
+
+        underline = {}
+        start_times, end_times = underline_runs(times, rounded)
+        for underline_duration in underline_durations:
+            keep = end_times - start_times >= underline_duration
+            underline[underline_duration] = [[start, end, 'underline'] for start, end in
+                                             zip(start_times[keep].tolist(), end_times[keep].tolist())]
+
+        for loop_duration, stationary_duration, underline_duration in \
+                product(loop_durations, stationary_durations, underline_durations):
+            events = loop[loop_duration] + stationary[stationary_duration] + underline[underline_duration]
+            rows.append({'factor': factor, 'loop_duration': loop_duration,
+                         'stationary_duration': stationary_duration, 'underline_duration': underline_duration,
+                         'loops': len(loop[loop_duration]), 'stationary': len(stationary[stationary_duration]),
+                         'underlines': len(underline[underline_duration]), 'events': events})
+
+    print(f"{len(rows)} settings swept over {len(times)} points")
+    return pd.DataFrame(rows, columns=['factor', 'loop_duration', 'stationary_duration', 'underline_duration',
+                                       'loops', 'stationary', 'underlines', 'events'])
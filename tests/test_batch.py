@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from cursor_tracker.batch import video_output_dirs
+
+def test_same_name_in_different_folders_gets_different_outputs():
+    video_paths = ['data/course1/lecture01.mp4', 'data/course2/lecture01.mp4', 'data/course2/lecture02.mp4']
+    assert video_output_dirs(video_paths, 'results') == {
+        'data/course1/lecture01.mp4': os.path.join('results', 'course1'),
+        'data/course2/lecture01.mp4': os.path.join('results', 'course2'),
+        'data/course2/lecture02.mp4': os.path.join('results', 'course2'),
+    }
+
+def test_videos_of_one_folder_share_output_dir():
+    assert set(video_output_dirs(['videos/a.mp4', 'videos/b.mp4'], 'results').values()) == {'results'}
+
+def test_same_name_in_one_folder_is_rejected():
+    with pytest.raises(ValueError, match='lecture01'):
+        video_output_dirs(['videos/lecture01.mp4', 'videos/lecture01.mov'], 'results')
@@ -0,0 +1,46 @@
+import pytest
+
+from cursor_tracker.detection_io import DetectionWriter, detections_to_array, iter_detections, read_checkpoint, \
+    save_detections
+
+def detection(timestamp):
+    return {'timestamp': timestamp, 'class_label': 'cursor', 'confidence': 0.9,
+            'bbox': [0, 0, 10, 10], 'coordinates': (5.0, 5.0)}
+
+def test_resume_after_checkpoint_without_writes(tmp_path):
+    path, checkpoint_path = str(tmp_path / 'out.jsonl'), str(tmp_path / 'out_checkpoint.json')
+
+    writer = DetectionWriter(path, checkpoint_path)
+    writer.write([detection(0)])
+    writer.checkpoint(0)
+    writer.write([detection(100)]) # lost in the crash
+    writer.file.close()
+
+    # resume, then checkpoint with no new detection, e.g. while the cursor is hidden
+    writer = DetectionWriter(path, checkpoint_path, resume=True)
+    writer.checkpoint(200)
+    writer.file.close()
+    assert read_checkpoint(checkpoint_path)['offset'] == len((tmp_path / 'out.jsonl').read_bytes())
+
+    writer = DetectionWriter(path, checkpoint_path, resume=True)
+    assert writer.last_timestamp == 200
+    writer.write([detection(300)])
+    writer.close(300)
+
+    assert [d['timestamp'] for d in iter_detections(path)] == [0, 300]
+    assert b'\x00' not in (tmp_path / 'out.jsonl').read_bytes()
+
+@pytest.mark.parametrize('max_det_1', [True, False])
+def test_npy_detections_have_the_keys_of_the_saved_records(tmp_path, max_det_1):
+    detections = []
+    for timestamp in range(0, 300, 100):
+        coordinates = (12.25 + timestamp, 40.5)
+        detection = {'timestamp': timestamp, 'class_label': 'cursor', 'confidence': 0.75,
+                     'bbox': [8, 36, 16, 45], 'coordinates': coordinates}
+        if max_det_1:
+            detection['coord_x'], detection['coord_y'] = coordinates
+        detections.append(detection)
+
+    path = str(tmp_path / 'detections.npy')
+    save_detections(*detections_to_array(detections), path)
+    assert list(iter_detections(path)) == detections
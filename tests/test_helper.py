@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from motion_analysis.helper import analyse_motion, detect_loops, detect_stationary, detect_underlines, get_all_info, \
+    is_clockwise_or_counterclockwise, round_to_factor, to_arrays
+
+def reference_events(time_coord_data, factor, loop_duration=500, stationary_duration=3000, underline_duration=2000):
+    '''
+    the nested sliding-window analyse_motion from before loops were found with prefix sums, kept as a reference
+    Returns: its loop + stationary + underline list of [start_time, end_time, type], before get_all_info
+    '''
+    window, loop, stationary, underline = [], [], [], []
+    previous_coords = None
+    for indx, (time, coord) in enumerate(time_coord_data):
+        window.append(time_coord_data[indx])
+        for time_inner, coord_inner in time_coord_data[indx+1:]:
+            window.append((time_inner, coord_inner))
+            if window[-1][0] - window[0][0] > loop_duration:
+                if is_clockwise_or_counterclockwise(list(map(lambda x: x[1], window))) and \
+                    (round_to_factor(window[-1][1][0], factor) == round_to_factor(window[0][1][0], factor)) and \
+                    (round_to_factor(window[-1][1][1], factor) == round_to_factor(window[0][1][1], factor)):
+                    if loop and loop[-1][0] <= window[0][0] <= loop[-1][1]:
+                        if window[-1][0] > loop[-1][1]:
+                            loop[-1][1] = window[-1][0]
+                    else:
+                        loop.append([window[0][0], window[-1][0], 'loop'])
+        window.clear()
+
+        coord_factored = (round_to_factor(coord[0], factor), round_to_factor(coord[1], factor))
+        if previous_coords is None:
+            current_stationary = [time, time]
+        elif coord_factored == previous_coords:
+            current_stationary[1] = time
+        else:
+            if current_stationary[1] - current_stationary[0] > stationary_duration:
+                stationary.append(current_stationary+['stationary'])
+            current_stationary = [time, time]
+
+        if previous_coords is None:
+            current_underline = [time, time]
+        elif coord_factored[1] == previous_coords[1] and coord_factored[0] != previous_coords[0]:
+            current_underline[1] = time
+        else:
+            if current_underline[1] - current_underline[0] >= underline_duration:
+                underline.append([current_underline[0], current_underline[1], 'underline'])
+            current_underline = [time, time]
+
+        previous_coords = coord_factored
+    return loop + stationary + underline
+
+def random_trajectory(seed, n=120):
+    ''' a cursor path of loops, pauses, horizontal strokes and jitter, one point every 100ms '''
+    rng = np.random.default_rng(seed)
+    points, position = [], rng.uniform(200, 800, 2)
+    while len(points) < n:
+        kind = rng.integers(4)
+        if kind == 0:
+            angles = rng.choice([-1, 1]) * np.linspace(0, 2*np.pi, int(rng.integers(6, 20)))
+            radius = rng.uniform(10, 80)
+            centre = position - (radius, 0)
+            segment = centre + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        elif kind == 1:
+            segment = position + rng.normal(0, 2, (int(rng.integers(10, 45)), 2))
+        elif kind == 2:
+            steps = int(rng.integers(5, 30))
+            segment = position + np.stack([np.arange(1, steps + 1) * rng.uniform(20, 50), np.zeros(steps)], axis=1)
+        else:
+            segment = position + np.cumsum(rng.normal(0, 30, (int(rng.integers(2, 10)), 2)), axis=0)
+        points.extend(segment.round(2).tolist())
+        position = segment[-1]
+    return [(100 * i, (x, y)) for i, (x, y) in enumerate(points[:n])]
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('factor', [8, 32])
+def test_detectors_match_reference(seed, factor):
+    time_coord_data = random_trajectory(seed)
+    times, points = to_arrays(time_coord_data)
+    events = detect_loops(times, points, factor, max_loop_duration=None) + \
+        detect_stationary(times, points, factor) + detect_underlines(times, points, factor)
+    assert events == reference_events(time_coord_data, factor)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_analyse_motion_matches_reference(seed):
+    time_coord_data = random_trajectory(seed)
+    expected = get_all_info(reference_events(time_coord_data, 16), time_coord_data)
+    assert analyse_motion(time_coord_data, 16, max_loop_duration=None) == expected
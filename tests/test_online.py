@@ -0,0 +1,21 @@
+import pytest
+
+from motion_analysis.helper import analyse_motion
+from motion_analysis.online import OnlineMotionAnalyser
+from test_helper import random_trajectory
+
+def by_type_and_start(all_info):
+    return sorted(all_info, key=lambda info: (info['type'], info['start_time']))
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('max_loop_duration', [1000, 2000, 10000])
+def test_online_events_match_analyse_motion(seed, max_loop_duration):
+    time_coord_data = random_trajectory(seed, n=400)
+    analyser = OnlineMotionAnalyser(16, max_loop_duration=max_loop_duration)
+    events = []
+    for time, coord in time_coord_data:
+        events.extend(analyser.feed(time, coord))
+    events.extend(analyser.close())
+    assert events == analyser.events
+    assert by_type_and_start(events) == \
+        by_type_and_start(analyse_motion(time_coord_data, 16, max_loop_duration=max_loop_duration))
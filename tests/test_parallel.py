@@ -0,0 +1,24 @@
+import pytest
+
+from motion_analysis.helper import analyse_motion
+from motion_analysis.parallel import analyse_sections
+from test_helper import random_trajectory
+
+def random_sections(seed):
+    ''' three sections of different lengths, one after the other in time '''
+    sections, offset = [], 0
+    for i, n in enumerate([50, 400, 250]):
+        section = [(time + offset, coord) for time, coord in random_trajectory(seed * 3 + i, n)]
+        sections.append(section)
+        offset = section[-1][0] + 5000
+    return sections
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('chunk_points', [37, 100])
+@pytest.mark.parametrize('max_loop_duration', [1000, None])
+def test_chunked_sections_match_analyse_motion(seed, chunk_points, max_loop_duration):
+    sections = random_sections(seed)
+    expected = [info for section in sections
+                for info in analyse_motion(section, 16, max_loop_duration=max_loop_duration)]
+    assert analyse_sections(sections, 16, max_loop_duration=max_loop_duration, workers=2,
+                            chunk_points=chunk_points) == expected
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import cv2
+
+from cursor_tracker.run import DetectionRenderer, read_frames
+
+class FakeCapture:
+    ''' stands in for cv2.VideoCapture of a video of n_frames at fps '''
+    def __init__(self, n_frames, fps):
+        self.times = [i * 1000 / fps for i in range(n_frames)]
+        self.index = -1
+
+    def grab(self):
+        self.index += 1
+        return self.index < len(self.times)
+
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_MSEC
+        return self.times[self.index]
+
+    def retrieve(self):
+        return True, np.zeros((4, 4, 3), np.uint8)
+
+def timestamps(start_after=None, sample_fps=None):
+    return [timestamp for timestamp, _ in read_frames(FakeCapture(50, 10), 4, 4, start_after, sample_fps)]
+
+@pytest.mark.parametrize('sample_fps', [None, 1, 3, 4, 10])
+def test_resumed_frames_match_uninterrupted_run(sample_fps):
+    uninterrupted = timestamps(sample_fps=sample_fps)
+    for checkpoint in uninterrupted[:-1]:
+        assert timestamps(checkpoint, sample_fps) == [t for t in uninterrupted if t > checkpoint]
+
+def test_threaded_renderer_reraises_render_errors(tmp_path):
+    renderer = DetectionRenderer(str(tmp_path / 'out.mp4'), 10, (4, 4), threaded=True, queue_size=2)
+    with pytest.raises(KeyError):
+        for _ in range(20):
+            renderer.write(np.zeros((4, 4, 3), np.uint8), [{'confidence': 0.9}]) # no bbox to draw
+        renderer.release()
+
+def test_threaded_renderer_reraises_error_of_last_frame_on_release(tmp_path):
+    renderer = DetectionRenderer(str(tmp_path / 'out.mp4'), 10, (4, 4), threaded=True)
+    renderer.write(np.zeros((4, 4, 3), np.uint8), [{'confidence': 0.9}])
+    with pytest.raises(KeyError):
+        renderer.release()
@@ -0,0 +1,20 @@
+import pytest
+
+from motion_analysis.helper import analyse_motion, get_all_info
+from motion_analysis.sweep import sweep_parameters
+from test_helper import random_trajectory
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('max_loop_duration', [1000, 10000])
+def test_sweep_rows_match_analyse_motion(seed, max_loop_duration):
+    time_coord_data = random_trajectory(seed, n=400)
+    results = sweep_parameters(time_coord_data, [8, 32], loop_durations=(0, 500, 1500),
+                               stationary_durations=(1000, 3000), underline_durations=(500, 2000),
+                               max_loop_duration=max_loop_duration)
+    assert len(results) == 2 * 3 * 2 * 2
+    for row in results.itertuples():
+        expected = analyse_motion(time_coord_data, row.factor, row.loop_duration, row.stationary_duration,
+                                  row.underline_duration, max_loop_duration)
+        assert get_all_info(row.events, time_coord_data) == expected
+        assert (row.loops, row.stationary, row.underlines) == \
+            tuple(sum(info['type'] == kind for info in expected) for kind in ('loop', 'stationary', 'underline'))